@@ -26,6 +26,8 @@ setup(
     package_dir={"": "src"},
     install_requires=requirements,
     extras_require={
+        "async-create": ["aiohttp"],
+        "compressed-artifacts": ["msgpack", "zstandard"],
         "load-image": ["zstandard"],
     },
     classifiers=[
@@ -13,7 +13,12 @@ from functools import reduce
 from requests.exceptions import HTTPError
 
 from taskgraph import create
-from taskgraph.decision import read_artifact, rename_artifact, write_artifact
+from taskgraph.decision import (
+    load_artifact,
+    read_artifact,
+    rename_artifact,
+    write_artifact,
+)
 from taskgraph.optimize.base import optimize_task_graph
 from taskgraph.taskgraph import TaskGraph
 from taskgraph.util.taskcluster import (
@@ -32,6 +37,21 @@ def get_parameters(decision_task_id):
     return get_artifact(decision_task_id, "public/parameters.yml")
 
 
+def fetch_full_task_graph(decision_task_id, graph_config):
+    """Fetch the full task graph generated by the given decision task, in the
+    first of the graph config's `taskgraph.task-graph-artifact-formats` it was
+    published in, falling back to JSON."""
+    for fmt in graph_config["taskgraph"].get("task-graph-artifact-formats", []):
+        path = f"public/full-task-graph.{fmt}"
+        try:
+            return load_artifact(get_artifact(decision_task_id, path), path)
+        except HTTPError as e:
+            if e.response.status_code != 404:  # type: ignore
+                raise
+            logger.debug(f"No {path} found for {decision_task_id}: {e}")
+    return get_artifact(decision_task_id, "public/full-task-graph.json")
+
+
 def fetch_graph_and_labels(parameters, graph_config, task_group_id=None):
     try:
         # Look up the decision_task id in the index
@@ -43,8 +63,9 @@ def fetch_graph_and_labels(parameters, graph_config, task_group_id=None):
         decision_task_id = task_group_id
 
     # First grab the graph and labels generated during the initial decision task
-    full_task_graph = get_artifact(decision_task_id, "public/full-task-graph.json")
-    _, full_task_graph = TaskGraph.from_json(full_task_graph)
+    full_task_graph = fetch_full_task_graph(decision_task_id, graph_config)
+    # most actions only touch a few tasks, so only materialize those
+    _, full_task_graph = TaskGraph.from_json(full_task_graph, lazy=True)
     label_to_taskid = get_artifact(decision_task_id, "public/label-to-taskid.json")
 
     # fetch everything in parallel; this avoids serializing any delay in downloading
@@ -154,13 +175,13 @@ def create_tasks(
         suffix = f"-{suffix}"
     to_run = set(to_run)
 
-    #  Copy to avoid side-effects later
-    full_task_graph = copy.deepcopy(full_task_graph)
     label_to_taskid = label_to_taskid.copy()
 
     target_graph = full_task_graph.graph.transitive_closure(to_run)
+    #  Copy the target tasks to avoid side-effects later
     target_task_graph = TaskGraph(
-        {l: modifier(full_task_graph[l]) for l in target_graph.nodes}, target_graph  # type: ignore
+        {l: modifier(copy.deepcopy(full_task_graph[l])) for l in target_graph.nodes},  # type: ignore
+        target_graph,
     )
     target_task_graph.for_each_task(update_parent)
     if decision_task_id and decision_task_id != os.environ.get("TASK_ID"):
@@ -173,7 +194,7 @@ def create_tasks(
         decision_task_id,
         existing_tasks=label_to_taskid,
     )
-    write_artifact(f"task-graph{suffix}.json", optimized_task_graph.to_json())
+    write_artifact(f"task-graph{suffix}.json", optimized_task_graph)
     write_artifact(f"label-to-taskid{suffix}.json", label_to_taskid)
     write_artifact(f"to-run{suffix}.json", list(to_run))
     create.create_tasks(
@@ -182,6 +203,7 @@ def create_tasks(
         label_to_taskid,
         params,
         decision_task_id,
+        backend=graph_config["taskgraph"].get("task-creation-backend"),
     )
     return label_to_taskid
 
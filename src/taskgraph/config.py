@@ -70,6 +70,24 @@ graph_config_schema = Schema(
                 "cache-pull-requests",
                 description="Should tasks from pull requests populate the cache",
             ): bool,
+            Optional(
+                "task-graph-artifact-formats",
+                description="Additional formats in which to write the task graph "
+                "artifacts. Action tasks fetch the full task graph in the first of "
+                "these formats, rather than as JSON.",
+            ): [Any("json.gz", "json.zst", "msgpack", "msgpack.gz", "msgpack.zst")],
+            Optional(
+                "task-creation-backend",
+                description="How the decision and action tasks create tasks: "
+                "from a pool of threads (the default), or from an asyncio event "
+                "loop (requires aiohttp).",
+            ): Any("threads", "asyncio"),
+            Optional(
+                "context-compression-threads",
+                description="Compress the Docker contexts written by the "
+                "decision task with this many threads (0 for one per CPU). "
+                "This changes the hash of every context.",
+            ): int,
             Optional(
                 "index-path-regexes",
                 description="Regular expressions matching index paths to be summarized.",
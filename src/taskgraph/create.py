@@ -3,14 +3,24 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import asyncio
+import collections
 import json
 import logging
+import random
 import sys
+import time
 from concurrent import futures
+from textwrap import dedent
 
 from slugid import nice as slugid
 
-from taskgraph.util.parameterization import resolve_timestamps
+try:
+    import aiohttp
+except ImportError as e:
+    aiohttp = e
+
+from taskgraph.util.parameterization import find_timestamps, resolve_timestamps
 from taskgraph.util.taskcluster import CONCURRENCY, get_session
 from taskgraph.util.time import current_json_time
 
@@ -19,8 +29,46 @@ logger = logging.getLogger(__name__)
 # this is set to true for `mach taskgraph action-callback --test`
 testing = False
 
+# the queue is reached through taskcluster-proxy, which adds credentials
+# appropriate to the decision or action task
+QUEUE_URL = "http://taskcluster/queue/v1"
+
+# how long, in seconds, tasks share the time against which their relative
+# datestamps are resolved
+NOW_RESOLUTION = 60
+
+# HTTP statuses on which creating a task is retried by the asyncio backend
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 
-def create_tasks(graph_config, taskgraph, label_to_taskid, params, decision_task_id):
+def create_tasks(
+    graph_config,
+    taskgraph,
+    label_to_taskid,
+    params,
+    decision_task_id,
+    concurrency=None,
+    rate_limit=None,
+    backend=None,
+    journal=None,
+):
+    """Create the tasks of `taskgraph` in Taskcluster, each task only once all
+    of its dependencies have been created.
+
+    At most `concurrency` tasks (default: `CONCURRENCY`) are created at the
+    same time, and at most `rate_limit` per second, if given.
+
+    Tasks are created from a pool of threads, unless `backend` is
+    ``"asyncio"``, in which case they are created from an event loop sharing
+    a pool of keep-alive connections (this requires `aiohttp`).
+
+    If `journal` is given, the id of each task is appended to that file once
+    the task has been created. If the file already exists for the same
+    decision task, e.g because a previous attempt died halfway through, the
+    tasks it lists are not created again. Tasks the queue reports as already
+    existing are then considered created, since the previous attempt may have
+    created some of them without recording it.
+    """
     taskid_to_label = {t: l for l, t in label_to_taskid.items()}
 
     # when running as an actual decision task, we use the decision task's
@@ -46,69 +94,218 @@ def create_tasks(graph_config, taskgraph, label_to_taskid, params, decision_task
         task_def["schedulerId"] = scheduler_id
 
     # If `testing` is True, then run without parallelization
-    concurrency = CONCURRENCY if not testing else 1
+    if testing:
+        concurrency = 1
+    concurrency = concurrency or CONCURRENCY
+
+    if backend not in (None, "threads", "asyncio"):
+        raise ValueError(f"unknown task creation backend {backend}")
+
+    already_created = set()
+    resuming = False
+    journal_fh = None
+    if journal:
+        already_created = read_journal(journal, decision_task_id)
+        if already_created is None:
+            already_created = set()
+            journal_fh = open(journal, "w")
+            journal_fh.write(f"{decision_task_id}\n")
+        else:
+            logger.info(
+                f"Skipping {len(already_created)} tasks created by a previous run"
+            )
+            resuming = True
+            journal_fh = open(journal, "a")
+
+    scheduler = _Scheduler(
+        taskgraph, taskid_to_label, already_created, journal_fh, resuming
+    )
+    limiter = _RateLimiter(rate_limit)
+    start = time.monotonic()
+    try:
+        if backend == "asyncio":
+            created = asyncio.run(_create_tasks_async(scheduler, concurrency, limiter))
+        else:
+            created = _create_tasks_threaded(scheduler, concurrency, limiter)
+    finally:
+        if journal_fh:
+            journal_fh.close()
+
+    elapsed = time.monotonic() - start
+    logger.info(
+        f"Created {created} tasks in {elapsed:.1f}s "
+        f"({created / max(elapsed, 0.001):.1f} tasks/s)"
+    )
+
+
+def read_journal(path, decision_task_id):
+    """Return the set of ids of the tasks recorded as created in the journal
+    at `path` by the decision task `decision_task_id`, or None if there is no
+    such journal."""
+    try:
+        with open(path) as fh:
+            lines = fh.read().splitlines()
+    except FileNotFoundError:
+        return None
+    if not lines or lines[0] != decision_task_id:
+        return None
+    return set(lines[1:])
+
+
+class _Scheduler:
+    """Track which tasks are ready to be created.
+
+    We can't submit a task until its dependencies have been created. So count
+    the dependencies within the graph that each task is waiting on, and make
+    it ready as soon as the last of them has been created. Walking the graph
+    in postorder makes the submission order deterministic when running
+    without parallelization.
+    """
+
+    def __init__(
+        self,
+        taskgraph,
+        taskid_to_label,
+        already_created=(),
+        journal=None,
+        resuming=False,
+    ):
+        self.taskgraph = taskgraph
+        self.taskid_to_label = taskid_to_label
+        self.journal = journal
+        # whether tasks may already have been created by a previous run
+        self.resuming = resuming
+
+        order = [
+            t for t in taskgraph.graph.visit_postorder() if t not in already_created
+        ]
+        alltasks = set(order)
+        self.waiting_on = {}
+        self.dependents = collections.defaultdict(list)
+        for task_id in order:
+            # Some dependencies aren't in our graph, or were already created,
+            # so make sure to filter those out
+            deps = set(taskgraph.tasks[task_id].task.get("dependencies", []))
+            deps &= alltasks
+            self.waiting_on[task_id] = len(deps)
+            for dep in deps:
+                self.dependents[dep].append(task_id)
+        self.ready = collections.deque(t for t in order if not self.waiting_on[t])
+        self._now = None
+        self._now_expires = 0
+
+    def now(self):
+        """Return the time against which to resolve relative datestamps.
+
+        It is shared by all the tasks created within `NOW_RESOLUTION` seconds,
+        so that each distinct datestamp only gets resolved once for them.
+        """
+        if time.monotonic() >= self._now_expires:
+            self._now = current_json_time(datetime_format=True)
+            self._now_expires = time.monotonic() + NOW_RESOLUTION
+        return self._now
+
+    def pop_ready(self):
+        """Yield a `(task_id, label, task_def, timestamp_paths, duplicate)`
+        tuple for each task to create now."""
+        while self.ready:
+            task_id = self.ready.popleft()
+            task = self.taskgraph.tasks[task_id]
+            label = self.taskid_to_label[task_id]
+            timestamp_paths = find_timestamps(task.task)
+            yield task_id, label, task.task, timestamp_paths, False
+
+            # Schedule tasks as many times as task_duplicates indicates
+            for i in range(1, task.attributes.get("task_duplicates", 1)):
+                # We use slugid() since we want a distinct task id
+                yield slugid(), label, task.task, timestamp_paths, True
+
+    def created(self, task_id):
+        """Record that `task_id` was created, making its dependents ready once
+        all of their dependencies have been created."""
+        if self.journal and task_id:
+            self.journal.write(f"{task_id}\n")
+            self.journal.flush()
+        for dependent in self.dependents.pop(task_id, ()):
+            self.waiting_on[dependent] -= 1
+            if not self.waiting_on[dependent]:
+                self.ready.append(dependent)
+
+
+def _create_tasks_threaded(scheduler, concurrency, limiter):
     session = get_session()
+    created = 0
     with futures.ThreadPoolExecutor(concurrency) as e:
+        # maps each future to the task id it creates, or None for duplicates
         fs = {}
+        while scheduler.ready or fs:
+            for task_id, label, task_def, paths, duplicate in scheduler.pop_ready():
+                limiter.wait()
+                fut = e.submit(
+                    create_task,
+                    session,
+                    task_id,
+                    label,
+                    task_def,
+                    now=scheduler.now(),
+                    timestamp_paths=paths,
+                    exists_ok=scheduler.resuming,
+                )
+                fs[fut] = None if duplicate else task_id
+
+            done, _ = futures.wait(fs, return_when=futures.FIRST_COMPLETED)
+            for fut in done:
+                task_id = fs.pop(fut)
+                # raise if the task couldn't be created, which stops
+                # scheduling any further tasks
+                fut.result()
+                created += 1
+                scheduler.created(task_id)
+    return created
+
+
+class _RateLimiter:
+    """Space out calls to `wait` so they return at most `rate` times per
+    second. A `rate` of None means no limit."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next = 0
 
-        # We can't submit a task until its dependencies have been submitted.
-        # So our strategy is to walk the graph and submit tasks once all
-        # their dependencies have been submitted.
-        tasklist = set(taskgraph.graph.visit_postorder())
-        alltasks = tasklist.copy()
-
-        def schedule_tasks():
-            # bail out early if any futures have failed
-            if any(f.done() and f.exception() for f in fs.values()):
-                return
-
-            to_remove = set()
-            new = set()
-
-            def submit(task_id, label, task_def):
-                fut = e.submit(create_task, session, task_id, label, task_def)
-                new.add(fut)
-                fs[task_id] = fut
-
-            for task_id in tasklist:
-                task_def = taskgraph.tasks[task_id].task
-                # If we haven't finished submitting all our dependencies yet,
-                # come back to this later.
-                # Some dependencies aren't in our graph, so make sure to filter
-                # those out
-                deps = set(task_def.get("dependencies", [])) & alltasks
-                if any((d not in fs or not fs[d].done()) for d in deps):
-                    continue
-
-                submit(task_id, taskid_to_label[task_id], task_def)
-                to_remove.add(task_id)
-
-                # Schedule tasks as many times as task_duplicates indicates
-                attributes = taskgraph.tasks[task_id].attributes
-                for i in range(1, attributes.get("task_duplicates", 1)):
-                    # We use slugid() since we want a distinct task id
-                    submit(slugid(), taskid_to_label[task_id], task_def)
-            tasklist.difference_update(to_remove)
-
-            # as each of those futures complete, try to schedule more tasks
-            for f in futures.as_completed(new):
-                schedule_tasks()
-
-        # start scheduling tasks and run until everything is scheduled
-        schedule_tasks()
-
-        # check the result of each future, raising an exception if it failed
-        for f in futures.as_completed(fs.values()):
-            f.result()
-
-
-def create_task(session, task_id, label, task_def):
+    def delay(self):
+        """Reserve the next slot, and return how many seconds to wait for
+        it."""
+        if not self.interval:
+            return 0
+        now = time.monotonic()
+        delay = max(0, self.next - now)
+        self.next = max(now, self.next) + self.interval
+        return delay
+
+    def wait(self):
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+
+
+def create_task(
+    session,
+    task_id,
+    label,
+    task_def,
+    now=None,
+    timestamp_paths=None,
+    exists_ok=False,
+):
     # create the task using 'http://taskcluster/queue', which is proxied to the queue service
     # with credentials appropriate to this task.
+    # If `exists_ok` is true, a task that already exists (with a different
+    # definition, e.g because its timestamps were resolved at another time) is
+    # considered created.
 
     # Resolve timestamps
-    now = current_json_time(datetime_format=True)
-    task_def = resolve_timestamps(now, task_def)
+    now = now or current_json_time(datetime_format=True)
+    task_def = resolve_timestamps(now, task_def, timestamp_paths)
 
     if testing:
         json.dump(
@@ -123,10 +320,124 @@ def create_task(session, task_id, label, task_def):
         return
 
     logger.info(f"Creating task with taskId {task_id} for {label}")
-    res = session.put(f"http://taskcluster/queue/v1/task/{task_id}", json=task_def)
+    res = session.put(f"{QUEUE_URL}/task/{task_id}", json=task_def)
+    if res.status_code == 409 and exists_ok:
+        logger.info(f"Task {task_id} for {label} already exists")
+        return
     if res.status_code != 200:
         try:
             logger.error(res.json()["message"])
         except Exception:
             logger.error(res.text)
         res.raise_for_status()
+
+
+async def _create_tasks_async(scheduler, concurrency, limiter):
+    if isinstance(aiohttp, ImportError):
+        raise ImportError(
+            dedent(
+                """
+                aiohttp is not installed! Use `pip install
+                taskcluster-taskgraph[async-create]` to create tasks with the
+                asyncio backend.
+                """
+            )
+        ) from aiohttp
+
+    semaphore = asyncio.BoundedSemaphore(concurrency)
+
+    async def create(task_id, label, task_def, timestamp_paths):
+        async with semaphore:
+            delay = limiter.delay()
+            if delay:
+                await asyncio.sleep(delay)
+            await create_task_async(
+                session,
+                task_id,
+                label,
+                task_def,
+                now=scheduler.now(),
+                timestamp_paths=timestamp_paths,
+                exists_ok=scheduler.resuming,
+            )
+
+    created = 0
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # maps each asyncio task to the task id it creates, or None for
+        # duplicates
+        pending = {}
+        try:
+            while scheduler.ready or pending:
+                for task_id, label, task_def, paths, duplicate in scheduler.pop_ready():
+                    fut = asyncio.ensure_future(create(task_id, label, task_def, paths))
+                    pending[fut] = None if duplicate else task_id
+
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for fut in done:
+                    task_id = pending.pop(fut)
+                    # raise if the task couldn't be created, which stops
+                    # scheduling any further tasks
+                    fut.result()
+                    created += 1
+                    scheduler.created(task_id)
+        finally:
+            # let the requests in flight finish, like the threaded backend
+            if pending:
+                await asyncio.wait(pending)
+    return created
+
+
+async def create_task_async(
+    session,
+    task_id,
+    label,
+    task_def,
+    now=None,
+    timestamp_paths=None,
+    retries=5,
+    exists_ok=False,
+):
+    """Like `create_task`, from an `aiohttp.ClientSession`.
+
+    Failed requests are retried up to `retries` times, after an exponential
+    backoff with full jitter.
+    """
+    now = now or current_json_time(datetime_format=True)
+    task_def = resolve_timestamps(now, task_def, timestamp_paths)
+
+    if testing:
+        json.dump(
+            [task_id, task_def],
+            sys.stdout,
+            sort_keys=True,
+            indent=4,
+            separators=(",", ": "),
+        )
+        # add a newline
+        print("")
+        return
+
+    logger.info(f"Creating task with taskId {task_id} for {label}")
+    url = f"{QUEUE_URL}/task/{task_id}"
+    for attempt in range(retries + 1):
+        try:
+            async with session.put(url, json=task_def) as res:
+                if res.status == 200:
+                    return
+                if res.status == 409 and exists_ok:
+                    logger.info(f"Task {task_id} for {label} already exists")
+                    return
+                if res.status not in RETRY_STATUSES or attempt == retries:
+                    text = await res.text()
+                    try:
+                        logger.error(json.loads(text)["message"])
+                    except Exception:
+                        logger.error(text)
+                    res.raise_for_status()
+        except aiohttp.ClientConnectionError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(random.uniform(0, 0.1 * 2**attempt))
@@ -3,6 +3,8 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import gzip
+import io
 import json
 import logging
 import os
@@ -10,17 +12,31 @@ import pathlib
 import shutil
 import time
 from pathlib import Path
+from textwrap import dedent
 
+import requests
 import yaml
 from voluptuous import Optional
 
+try:
+    import msgpack
+except ImportError as e:
+    msgpack = e
+
+try:
+    import zstandard as zstd
+except ImportError as e:
+    zstd = e
+
 from taskgraph.actions import render_actions_json
-from taskgraph.create import create_tasks
+from taskgraph.config import load_graph_config
+from taskgraph.create import create_tasks, read_journal
 from taskgraph.generator import TaskGraphGenerator
 from taskgraph.parameters import Parameters, get_version
 from taskgraph.taskgraph import TaskGraph
 from taskgraph.util.python_path import find_object
 from taskgraph.util.schema import Schema, validate_schema
+from taskgraph.util.taskcluster import get_artifact_url, get_session, list_artifacts
 from taskgraph.util.vcs import Repository, get_repository
 from taskgraph.util.yaml import load_yaml
 
@@ -28,6 +44,13 @@ logger = logging.getLogger(__name__)
 
 ARTIFACTS_DIR = Path("artifacts")
 
+# records the tasks created so far, so a decision task dying halfway through
+# creating them can be resumed
+JOURNAL = "task-creation-journal.txt"
+
+# the prefix under which the contents of ARTIFACTS_DIR are uploaded
+ARTIFACTS_PREFIX = "public/"
+
 
 # For each project, this gives a set of parameters specific to the project.
 # See `taskcluster/docs/parameters.rst` for information on parameters.
@@ -47,8 +70,13 @@ try_task_config_schema_v2 = Schema(
 
 
 def full_task_graph_to_runnable_tasks(full_task_json):
+    """Extract the runnable jobs from `full_task_json`, either the result of
+    `TaskGraph.to_json` or the pairs generated by `TaskGraph.iter_json`."""
+    if isinstance(full_task_json, dict):
+        full_task_json = full_task_json.items()
+
     runnable_tasks = {}
-    for label, node in full_task_json.items():
+    for label, node in full_task_json:
         if not ("extra" in node["task"] and "treeherder" in node["task"]["extra"]):
             continue
 
@@ -88,6 +116,15 @@ def taskgraph_decision(options, parameters=None):
     if not os.path.isdir(ARTIFACTS_DIR):
         os.mkdir(ARTIFACTS_DIR)
 
+    decision_task_id = os.environ["TASK_ID"]
+
+    journal = ARTIFACTS_DIR / JOURNAL
+    if read_journal(journal, decision_task_id) is not None or fetch_previous_run(
+        decision_task_id
+    ):
+        resume_create_tasks(options, decision_task_id)
+        return
+
     # optimizations are difficult to debug after the fact, so we always
     # log them at DEBUG level, and write the log as a separate artifact
     opt_log = logging.getLogger("optimization")
@@ -101,14 +138,13 @@ def taskgraph_decision(options, parameters=None):
         lambda graph_config: get_decision_parameters(graph_config, options)
     )
 
-    decision_task_id = os.environ["TASK_ID"]
-
     # create a TaskGraphGenerator instance
     tgg = TaskGraphGenerator(
         root_dir=options.get("root"),
         parameters=parameters,
         decision_task_id=decision_task_id,
         write_artifacts=True,
+        kind_workers=options.get("kind_workers"),
     )
 
     # write out the parameters used to generate this graph
@@ -121,23 +157,24 @@ def taskgraph_decision(options, parameters=None):
     )
 
     # write out the full graph for reference
-    full_task_json = tgg.full_task_graph.to_json()
-    write_artifact("full-task-graph.json", full_task_json)
+    write_task_graph_artifact(
+        "full-task-graph.json", tgg.full_task_graph, tgg.graph_config
+    )
 
     # write out the public/runnable-jobs.json file
     write_artifact(
-        "runnable-jobs.json", full_task_graph_to_runnable_tasks(full_task_json)
+        "runnable-jobs.json",
+        full_task_graph_to_runnable_tasks(tgg.full_task_graph.iter_json()),
     )
 
-    # this is just a test to check whether the from_json() function is working
-    _, _ = TaskGraph.from_json(full_task_json)
-
     # write out the target task set to allow reproducing this as input
     write_artifact("target-tasks.json", list(tgg.target_task_set.tasks.keys()))
 
     # write out the optimized task graph to describe what will actually happen,
     # and the map of labels to taskids
-    write_artifact("task-graph.json", tgg.morphed_task_graph.to_json())
+    write_task_graph_artifact(
+        "task-graph.json", tgg.morphed_task_graph, tgg.graph_config
+    )
     write_artifact("label-to-taskid.json", tgg.label_to_taskid)
 
     # write out current run-task and fetch-content scripts
@@ -152,6 +189,70 @@ def taskgraph_decision(options, parameters=None):
         tgg.label_to_taskid,
         tgg.parameters,
         decision_task_id=decision_task_id,
+        backend=tgg.graph_config["taskgraph"].get("task-creation-backend"),
+        journal=journal,
+    )
+
+
+def fetch_previous_run(decision_task_id):
+    """Download the artifacts of the latest previous run of the decision task
+    that started creating tasks to ARTIFACTS_DIR. Return whether there is
+    one, in which case the creation of the tasks can be resumed.
+
+    Runs that didn't upload their artifacts (e.g because the worker was lost)
+    are skipped over.
+    """
+    run_id = int(os.environ.get("RUN_ID", 0))
+    for previous_run_id in range(run_id - 1, -1, -1):
+        try:
+            _download_artifact(decision_task_id, previous_run_id, JOURNAL)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                continue
+            raise
+        break
+    else:
+        return False
+
+    logger.info(f"Fetching the artifacts of run {previous_run_id}")
+    for artifact in list_artifacts(decision_task_id, run_id=previous_run_id):
+        name = artifact["name"]
+        if not name.startswith(ARTIFACTS_PREFIX) or name.startswith("public/logs/"):
+            continue
+        path = name[len(ARTIFACTS_PREFIX) :]
+        if path != JOURNAL:
+            _download_artifact(decision_task_id, previous_run_id, path)
+    return read_journal(ARTIFACTS_DIR / JOURNAL, decision_task_id) is not None
+
+
+def _download_artifact(task_id, run_id, path):
+    """Download the artifact `path` of the given run of `task_id` to the same
+    path in ARTIFACTS_DIR."""
+    url = get_artifact_url(task_id, ARTIFACTS_PREFIX + path, run_id=run_id)
+    response = get_session().get(url, stream=True)
+    response.raise_for_status()
+    dest = ARTIFACTS_DIR / path
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with open(dest, "wb") as fh:
+        for chunk in response.iter_content(chunk_size=2**20):
+            fh.write(chunk)
+
+
+def resume_create_tasks(options, decision_task_id):
+    """Create the tasks that a previous run of the decision task didn't get to,
+    from the artifacts it wrote, rather than generating the graph again (which
+    would assign new task ids)."""
+    logger.info(f"Resuming the creation of the tasks listed in {JOURNAL}")
+    graph_config = load_graph_config(options.get("root") or "taskcluster")
+    _, task_graph = TaskGraph.from_json(read_artifact("task-graph.json"))
+    create_tasks(
+        graph_config,
+        task_graph,
+        read_artifact("label-to-taskid.json"),
+        read_artifact("parameters.yml"),
+        decision_task_id=decision_task_id,
+        backend=graph_config["taskgraph"].get("task-creation-backend"),
+        journal=ARTIFACTS_DIR / JOURNAL,
     )
 
 
@@ -364,40 +465,130 @@ def set_try_config(parameters, task_config_file):
             )
 
 
+def _artifact_format(filename):
+    """Return the `(format, compression)` extensions of the artifact
+    `filename`, e.g `(".json", ".zst")` for ``task-graph.json.zst``."""
+    base, ext = os.path.splitext(filename)
+    compression = None
+    if ext in (".gz", ".zst"):
+        compression = ext
+        base, ext = os.path.splitext(base)
+        if ext not in (".yml", ".json", ".msgpack"):
+            # compressed artifacts without a format extension hold JSON
+            ext = ".json"
+    return ext, compression
+
+
+def _require(module, extension):
+    if isinstance(module, ImportError):
+        raise ImportError(
+            dedent(
+                f"""
+                {module.name} is not installed! Use `pip install
+                taskcluster-taskgraph[compressed-artifacts]` to handle `{extension}`
+                artifacts.
+                """
+            )
+        ) from module
+    return module
+
+
+def _dump(data, fmt, fh):
+    """Serialize `data` to the binary file `fh` in the format `fmt`."""
+    if fmt == ".msgpack":
+        packer = _require(msgpack, fmt).Packer()
+        if isinstance(data, TaskGraph):
+            fh.write(packer.pack_map_header(len(data.tasks)))
+            for key, task_json in data.iter_json():
+                fh.write(packer.pack(key))
+                fh.write(packer.pack(task_json))
+        else:
+            fh.write(packer.pack(data))
+        return
+
+    f = io.TextIOWrapper(fh, encoding="utf-8")
+    if fmt == ".yml":
+        if isinstance(data, TaskGraph):
+            data = data.to_json()
+        yaml.safe_dump(data, f, allow_unicode=True, default_flow_style=False)
+    elif isinstance(data, TaskGraph):
+        data.write_json(f)
+    else:
+        json.dump(data, f, sort_keys=True, indent=2, separators=(",", ": "))
+    f.flush()
+    f.detach()
+
+
+def load_artifact(fh, filename):
+    """Deserialize the contents of the artifact `filename` from the binary
+    file `fh`, decompressing it if necessary.
+
+    This allows reading compressed or msgpack-encoded artifacts fetched from
+    Taskcluster, e.g via `taskgraph.util.taskcluster.get_artifact`.
+    """
+    fmt, compression = _artifact_format(filename)
+    if compression == ".gz":
+        fh = gzip.GzipFile(fileobj=fh, mode="rb")
+    elif compression == ".zst":
+        fh = _require(zstd, compression).ZstdDecompressor().stream_reader(fh)
+
+    if fmt == ".msgpack":
+        return _require(msgpack, fmt).unpack(fh, raw=False)
+    elif fmt == ".yml":
+        return yaml.load(fh, Loader=yaml.SafeLoader)
+    elif fmt == ".json":
+        return json.load(fh)
+    raise TypeError(f"Don't know how to read {filename}")
+
+
 def write_artifact(filename, data):
+    """Write `data` to the artifact `filename`, in the format given by its
+    extension. A `TaskGraph` is serialized as if by its `to_json` method, but
+    is streamed to the file one task at a time.
+
+    Besides ``.yml`` and ``.json``, artifacts may be encoded with
+    ``.msgpack``, and any of these may be compressed with a trailing ``.gz``
+    or ``.zst`` extension (e.g ``task-graph.msgpack.zst``).
+    """
     logger.info(f"writing artifact file `{filename}`")
     if not os.path.isdir(ARTIFACTS_DIR):
         os.mkdir(ARTIFACTS_DIR)
     path = ARTIFACTS_DIR / filename
-    if filename.endswith(".yml"):
-        with open(path, "w") as f:
-            yaml.safe_dump(data, f, allow_unicode=True, default_flow_style=False)
-    elif filename.endswith(".json"):
-        with open(path, "w") as f:
-            json.dump(data, f, sort_keys=True, indent=2, separators=(",", ": "))
-    elif filename.endswith(".gz"):
-        import gzip
-
-        with gzip.open(path, "wb") as f:
-            f.write(json.dumps(data))  # type: ignore
-    else:
+    fmt, compression = _artifact_format(filename)
+    if fmt not in (".yml", ".json", ".msgpack"):
         raise TypeError(f"Don't know how to write to {filename}")
 
+    with open(path, "wb") as fh:
+        if compression == ".gz":
+            with gzip.GzipFile(fileobj=fh, mode="wb") as f:
+                _dump(data, fmt, f)
+        elif compression == ".zst":
+            cctx = _require(zstd, compression).ZstdCompressor()
+            with cctx.stream_writer(fh, closefd=False) as f:
+                _dump(data, fmt, f)
+        else:
+            _dump(data, fmt, fh)
+
+
+def write_task_graph_artifact(filename, taskgraph, graph_config):
+    """Write `taskgraph` to the JSON artifact `filename`, as well as in each of
+    the additional formats listed in the graph config's
+    `taskgraph.task-graph-artifact-formats` (e.g ``task-graph.msgpack.zst``).
+    """
+    write_artifact(filename, taskgraph)
+    base = os.path.splitext(filename)[0]
+    for fmt in graph_config["taskgraph"].get("task-graph-artifact-formats", []):
+        write_artifact(f"{base}.{fmt}", taskgraph)
+
 
 def read_artifact(filename):
-    path = ARTIFACTS_DIR / filename
-    if filename.endswith(".yml"):
-        return load_yaml(path, filename)
-    elif filename.endswith(".json"):
-        with open(path) as f:
-            return json.load(f)
-    elif filename.endswith(".gz"):
-        import gzip
-
-        with gzip.open(path, "rb") as f:
-            return json.load(f)
-    else:
+    fmt, compression = _artifact_format(filename)
+    if fmt not in (".yml", ".json", ".msgpack"):
         raise TypeError(f"Don't know how to read {filename}")
+    if fmt == ".yml" and not compression:
+        return load_yaml(ARTIFACTS_DIR, filename)
+    with open(ARTIFACTS_DIR / filename, "rb") as fh:
+        return load_artifact(fh, filename)
 
 
 def rename_artifact(src, dest):
@@ -93,7 +93,7 @@ def load_image_by_task_id(task_id, tag=None):
     return True
 
 
-def build_context(name, outputFile, args=None):
+def build_context(name, outputFile, args=None, compression_threads=None):
     """Build a context.tar for image with specified name."""
     if not name:
         raise ValueError("must provide a Docker image name")
@@ -104,10 +104,12 @@ def build_context(name, outputFile, args=None):
     if not os.path.isdir(image_dir):
         raise Exception(f"image directory does not exist: {image_dir}")
 
-    docker.create_context_tar(".", image_dir, outputFile, args)
+    docker.create_context_tar(
+        ".", image_dir, outputFile, args, compression_threads=compression_threads
+    )
 
 
-def build_image(name, tag, args=None):
+def build_image(name, tag, args=None, compression_threads=None):
     """Build a Docker image of specified name.
 
     Output from image building process will be printed to stdout.
@@ -122,7 +124,9 @@ def build_image(name, tag, args=None):
     tag = tag or docker.docker_image(name, by_tag=True)
 
     buf = BytesIO()
-    docker.stream_context_tar(".", image_dir, buf, "", args)
+    docker.stream_context_tar(
+        ".", image_dir, buf, "", args, compression_threads=compression_threads
+    )
     cmdargs = ["docker", "image", "build", "--no-cache", "-"]
     if tag:
         cmdargs.insert(-1, f"-t={tag}")
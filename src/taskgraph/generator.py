@@ -2,12 +2,14 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import copy
 import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from typing import Dict
 
+import taskgraph
+
 from . import filter_tasks
 from .config import GraphConfig, load_graph_config
 from .graph import Graph
@@ -17,6 +19,7 @@ from .parameters import parameters_loader
 from .task import Task
 from .taskgraph import TaskGraph
 from .transforms.base import TransformConfig, TransformSequence
+from .util.copy import deepcopy
 from .util.python_path import find_object
 from .util.verify import verifications
 from .util.yaml import load_yaml
@@ -46,7 +49,7 @@ class Kind:
 
     def load_tasks(self, parameters, loaded_tasks, write_artifacts):
         loader = self._get_loader()
-        config = copy.deepcopy(self.config)
+        config = deepcopy(self.config)
 
         kind_dependencies = config.get("kind-dependencies", [])
         kind_dependencies_tasks = {
@@ -102,6 +105,29 @@ class Kind:
         return cls(kind_name, path, config, graph_config)
 
 
+def _load_tasks_in_worker(kind, parameters, loaded_tasks, write_artifacts, fast):
+    """Load the tasks for `kind` in a worker process.
+
+    Workers that were not forked from the generating process don't inherit
+    its state, so the graph config is registered and the `fast` flag set
+    again before loading.
+    """
+    kind.graph_config.register()
+    taskgraph.fast = fast
+    return kind.load_tasks(parameters, loaded_tasks, write_artifacts)
+
+
+def _kind_dependencies_tasks(kind_name, postorder, dependencies, loaded):
+    """Return the tasks of the kind-dependencies of `kind_name`, in the order
+    their kinds were loaded."""
+    return [
+        task
+        for dep in postorder
+        if dep in dependencies[kind_name]
+        for task in loaded[dep]
+    ]
+
+
 class TaskGraphGenerator:
     """
     The central controller for taskgraph.  This handles all phases of graph
@@ -123,12 +149,26 @@ class TaskGraphGenerator:
         parameters,
         decision_task_id="DECISION-TASK",
         write_artifacts=False,
+        kind_workers=None,
+        kind_cache=None,
+        reuse_kinds=None,
     ):
         """
         @param root_dir: root directory containing the Taskgraph config.yml file
         @param parameters: parameters for this task-graph generation, or callable
             taking a `GraphConfig` and returning parameters
         @type parameters: Union[Parameters, Callable[[GraphConfig], Parameters]]
+        @param kind_workers: if greater than 1, kinds that don't depend on one
+            another are loaded concurrently on a pool of this many processes
+        @type kind_workers: Optional[int]
+        @param kind_cache: cache of the tasks generated by each kind, consulted
+            before running a kind's transforms (ignored when writing artifacts)
+        @type kind_cache: Optional[KindCache]
+        @param reuse_kinds: mapping of kind names to the `kind_cache`
+            `(parameters_key, key)` pair of tasks generated for that kind by
+            another run, to use instead of loading the kind again when the
+            parameters are the same (e.g when diffing against another revision)
+        @type reuse_kinds: Optional[Dict[str, Tuple[str, str]]]
         """
         if root_dir is None:
             root_dir = "taskcluster"
@@ -136,6 +176,12 @@ class TaskGraphGenerator:
         self._parameters = parameters
         self._decision_task_id = decision_task_id
         self._write_artifacts = write_artifacts
+        self._kind_workers = kind_workers
+        self._kind_cache = kind_cache
+        self._reuse_kinds = reuse_kinds or {}
+        # the kind cache `(parameters_key, key)` pair of the tasks of each
+        # loaded kind
+        self.kind_cache_keys = {}
 
         # start the generator
         self._run = self._run()  # type: ignore
@@ -303,24 +349,10 @@ class TaskGraphGenerator:
             )
 
         logger.info("Generating full task set")
-        all_tasks = {}
-        for kind_name in kind_graph.visit_postorder():
-            logger.debug(f"Loading tasks for kind {kind_name}")
-            kind = kinds[kind_name]
-            try:
-                new_tasks = kind.load_tasks(
-                    parameters,
-                    list(all_tasks.values()),
-                    self._write_artifacts,
-                )
-            except Exception:
-                logger.exception(f"Error loading tasks for kind {kind_name}:")
-                raise
-            for task in new_tasks:
-                if task.label in all_tasks:
-                    raise Exception("duplicate tasks with label " + task.label)
-                all_tasks[task.label] = task
-            logger.info(f"Generated {len(new_tasks)} tasks for kind {kind_name}")
+        if self._kind_workers and self._kind_workers > 1:
+            all_tasks = self._load_tasks_parallel(kinds, kind_graph, parameters)
+        else:
+            all_tasks = self._load_tasks_serial(kinds, kind_graph, parameters)
         full_task_set = TaskGraph(all_tasks, Graph(set(all_tasks), set()))  # type: ignore
         yield self.verify("full_task_set", full_task_set, graph_config, parameters)
 
@@ -419,6 +451,133 @@ class TaskGraphGenerator:
             "morphed_task_graph", morphed_task_graph, graph_config, parameters
         )
 
+    def _load_tasks_serial(self, kinds, kind_graph, parameters):
+        # Each kind is only passed the tasks of its kind-dependencies, like
+        # when loading in parallel, where other kinds may not be loaded yet.
+        postorder = list(kind_graph.visit_postorder())
+        dependencies = kind_graph.links_dict()
+        all_tasks = {}
+        loaded = {}
+        for kind_name in postorder:
+            logger.debug(f"Loading tasks for kind {kind_name}")
+            kind = kinds[kind_name]
+            loaded_tasks = _kind_dependencies_tasks(
+                kind_name, postorder, dependencies, loaded
+            )
+            cache_key = self._cache_key(kind, parameters, loaded_tasks)
+            new_tasks = self._get_cached_tasks(kind_name, cache_key)
+            if new_tasks is None:
+                try:
+                    new_tasks = kind.load_tasks(
+                        parameters,
+                        loaded_tasks,
+                        self._write_artifacts,
+                    )
+                except Exception:
+                    logger.exception(f"Error loading tasks for kind {kind_name}:")
+                    raise
+                if cache_key:
+                    self._kind_cache.put(cache_key, new_tasks)  # type: ignore
+            loaded[kind_name] = new_tasks
+            self._add_kind_tasks(all_tasks, kind_name, new_tasks)
+        return all_tasks
+
+    def _load_tasks_parallel(self, kinds, kind_graph, parameters):
+        # Group the kinds into waves, such that every kind's dependencies are
+        # in an earlier wave. The kinds within a wave are loaded concurrently
+        # and each is only passed the tasks of its kind-dependencies.
+        postorder = list(kind_graph.visit_postorder())
+        dependencies = kind_graph.links_dict()
+        wave_of = {}
+        for kind_name in postorder:
+            wave_of[kind_name] = 1 + max(
+                (wave_of[dep] for dep in dependencies[kind_name]), default=-1
+            )
+        waves = [[] for _ in range(max(wave_of.values(), default=-1) + 1)]
+        for kind_name in postorder:
+            waves[wave_of[kind_name]].append(kind_name)
+
+        logger.info(
+            f"Loading {len(postorder)} kinds in {len(waves)} waves "
+            f"with {self._kind_workers} workers"
+        )
+        loaded = {}
+        with ProcessPoolExecutor(max_workers=self._kind_workers) as executor:
+            for wave in waves:
+                futures = {}
+                cache_keys = {}
+                for kind_name in wave:
+                    kind = kinds[kind_name]
+                    loaded_tasks = _kind_dependencies_tasks(
+                        kind_name, postorder, dependencies, loaded
+                    )
+                    cache_key = self._cache_key(kind, parameters, loaded_tasks)
+                    tasks = self._get_cached_tasks(kind_name, cache_key)
+                    if tasks is not None:
+                        loaded[kind_name] = tasks
+                        continue
+                    cache_keys[kind_name] = cache_key
+                    futures[kind_name] = executor.submit(
+                        _load_tasks_in_worker,
+                        kind,
+                        parameters,
+                        loaded_tasks,
+                        self._write_artifacts,
+                        taskgraph.fast,
+                    )
+                for kind_name, future in futures.items():
+                    try:
+                        loaded[kind_name] = future.result()
+                    except Exception:
+                        logger.exception(f"Error loading tasks for kind {kind_name}:")
+                        raise
+                    if cache_keys[kind_name]:
+                        self._kind_cache.put(cache_keys[kind_name], loaded[kind_name])  # type: ignore
+
+        # merge in the same order as a serial run, so the result is identical
+        all_tasks = {}
+        for kind_name in postorder:
+            self._add_kind_tasks(all_tasks, kind_name, loaded[kind_name])
+        return all_tasks
+
+    def _cache_key(self, kind, parameters, loaded_tasks):
+        # Transforms may write artifacts as a side effect, which a cache hit
+        # would skip.
+        if not self._kind_cache or self._write_artifacts:
+            return None
+        cache_key = self._kind_cache.key(kind, parameters, loaded_tasks)
+        self.kind_cache_keys[kind.name] = (
+            self._kind_cache.parameters_key(parameters),
+            cache_key,
+        )
+        return cache_key
+
+    def _get_cached_tasks(self, kind_name, cache_key):
+        if not cache_key:
+            return None
+        # tasks generated with other parameters can't be reused, as they may
+        # embed parameter values
+        parameters_key = self.kind_cache_keys[kind_name][0]
+        if kind_name in self._reuse_kinds:
+            reuse_parameters_key, reuse_key = self._reuse_kinds[kind_name]
+            if reuse_parameters_key == parameters_key:
+                tasks = self._kind_cache.get(reuse_key)  # type: ignore
+                if tasks is not None:
+                    logger.debug(f"Reusing tasks for unaffected kind {kind_name}")
+                    self.kind_cache_keys[kind_name] = (parameters_key, reuse_key)
+                    return tasks
+        tasks = self._kind_cache.get(cache_key)  # type: ignore
+        if tasks is not None:
+            logger.debug(f"Using cached tasks for kind {kind_name}")
+        return tasks
+
+    def _add_kind_tasks(self, all_tasks, kind_name, new_tasks):
+        for task in new_tasks:
+            if task.label in all_tasks:
+                raise Exception("duplicate tasks with label " + task.label)
+            all_tasks[task.label] = task
+        logger.info(f"Generated {len(new_tasks)} tasks for kind {kind_name}")
+
     def _run_until(self, name):
         while name not in self._run_results:
             try:
@@ -4,10 +4,73 @@
 
 
 import collections
+import functools
+import heapq
+import itertools
+from array import array
 from dataclasses import dataclass
 from typing import FrozenSet
 
 
+class _Adjacency:
+    """Integer-indexed adjacency of a graph in one direction, stored in
+    compressed sparse row (CSR) form.
+
+    The edges leaving node ``i`` lead to the nodes
+    ``targets[offsets[i]:offsets[i + 1]]`` and carry the edge names at the
+    same positions in ``names``. Nodes and edge names are integers indexing
+    into the interned tuples of the owning :class:`Graph`.
+    """
+
+    __slots__ = ("offsets", "targets", "names")
+
+    def __init__(self, size, sources, targets, names):
+        # the edges are given as parallel sequences of integers
+        order = sorted(range(len(sources)), key=sources.__getitem__)
+        counts = [0] * (size + 1)
+        for source in sources:
+            counts[source + 1] += 1
+        self.offsets = array("I", itertools.accumulate(counts))
+        self.targets = array("I", map(targets.__getitem__, order))
+        self.names = array("I", map(names.__getitem__, order))
+
+    def edges(self, node):
+        """Return `(target, name)` pairs for the edges leaving `node`."""
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.names[start:end])
+
+
+class _CompactGraph:
+    """Compact form of a :class:`Graph`, in which node labels and edge names
+    are interned to integers.
+
+    Labels are sorted, so integer order matches label order. The adjacency in
+    each direction is only built when first used.
+    """
+
+    def __init__(self, graph):
+        edges = graph.edges
+        labels = set(graph.nodes)
+        labels.update(left for left, _, _ in edges)
+        labels.update(right for _, right, _ in edges)
+        self.labels = tuple(sorted(labels))
+        self.index = index = dict(zip(self.labels, itertools.count()))
+        self.names = tuple(dict.fromkeys(name for _, _, name in edges))
+
+        name_index = dict(zip(self.names, itertools.count()))
+        self._lefts = [index[left] for left, _, _ in edges]
+        self._rights = [index[right] for _, right, _ in edges]
+        self._names = [name_index[name] for _, _, name in edges]
+
+    @functools.cached_property
+    def forward(self):
+        return _Adjacency(len(self.labels), self._lefts, self._rights, self._names)
+
+    @functools.cached_property
+    def reverse(self):
+        return _Adjacency(len(self.labels), self._rights, self._lefts, self._names)
+
+
 @dataclass(frozen=True)
 class Graph:
     """Generic representation of a directed acyclic graph with labeled edges
@@ -15,18 +78,38 @@ class Graph:
     manner, so the data structure is immutable.
 
     It permits at most one edge of a given name between any set of nodes.  The
-    graph is not checked for cycles, and methods may hang or otherwise fail if
+    graph is not checked for cycles on construction, and methods may fail if
     given a cyclic graph.
 
     The `nodes` and `edges` attributes may be accessed in a read-only fashion.
     The `nodes` attribute is a set of node names, while `edges` is a set of
     `(left, right, name)` tuples representing an edge named `name` going from
     node `left` to node `right`..
+
+    Internally, transitive closures run on a compact representation in which
+    node labels and edge names are interned to integers and the edges are
+    stored in flat arrays. It is built the first time it is needed and kept
+    with the graph, as are the topological orders.
     """
 
     nodes: FrozenSet
     edges: FrozenSet
 
+    # `functools.cached_property` stores its value in the instance's
+    # `__dict__`, bypassing the frozen dataclass's `__setattr__`, and the
+    # cached values don't take part in comparisons or hashing.
+    @functools.cached_property
+    def _compact(self):
+        return _CompactGraph(self)
+
+    @functools.cached_property
+    def _postorder(self):
+        return self._topological_order(reverse=False)
+
+    @functools.cached_property
+    def _preorder(self):
+        return self._topological_order(reverse=True)
+
     def transitive_closure(self, nodes, reverse=False):
         """Return the transitive closure of <nodes>: the graph containing all
         specified nodes as well as any nodes reachable from them, and any
@@ -54,54 +137,76 @@ class Graph:
                 f"Unknown nodes in transitive closure: {nodes - self.nodes}"
             )
 
-        # generate a new graph by expanding along edges until reaching a fixed
-        # point
-        new_nodes, new_edges = nodes, set()
-        nodes, edges = set(), set()
-        while (new_nodes, new_edges) != (nodes, edges):
-            nodes, edges = new_nodes, new_edges
-            add_edges = {
-                (left, right, name)
-                for (left, right, name) in self.edges
-                if (right if reverse else left) in nodes
-            }
-            add_nodes = {(left if reverse else right) for (left, right, _) in add_edges}
-            new_nodes = nodes | add_nodes
-            new_edges = edges | add_edges
+        # generate a new graph by walking the edges out of each reachable node
+        # exactly once
+        compact = self._compact
+        labels, names = compact.labels, compact.names
+        adjacency = compact.reverse if reverse else compact.forward
+        reached = bytearray(len(labels))
+        queue = collections.deque()
+        for node in nodes:
+            index = compact.index[node]
+            reached[index] = 1
+            queue.append(index)
+
+        new_nodes, new_edges = set(nodes), set()
+        while queue:
+            index = queue.popleft()
+            for linked, name in adjacency.edges(index):
+                if reverse:
+                    new_edges.add((labels[linked], labels[index], names[name]))
+                else:
+                    new_edges.add((labels[index], labels[linked], names[name]))
+                if not reached[linked]:
+                    reached[linked] = 1
+                    new_nodes.add(labels[linked])
+                    queue.append(linked)
         return Graph(new_nodes, new_edges)  # type: ignore
 
-    def _visit(self, reverse):
-        queue = collections.deque(sorted(self.nodes))
-        links_by_node = self.reverse_links_dict() if reverse else self.links_dict()
-        seen = set()
-        while queue:
-            node = queue.popleft()
-            if node in seen:
-                continue
-            links = links_by_node[node]
-            if all((n in seen) for n in links):
-                seen.add(node)
-                yield node
-            else:
-                queue.extend(n for n in links if n not in seen)
-                queue.append(node)
+    def _topological_order(self, reverse):
+        # Kahn's algorithm: a node becomes ready once every node it links to
+        # (or, in reverse, every node linking to it) has been visited. Ready
+        # nodes are taken in sorted order so the traversal is deterministic.
+        pending = dict.fromkeys(self.nodes, 0)
+        unblocks = collections.defaultdict(list)
+        for left, right, _ in self.edges:
+            if reverse:
+                left, right = right, left
+            pending[left] += 1
+            unblocks[right].append(left)
+
+        ready = [node for node, count in pending.items() if not count]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            node = heapq.heappop(ready)
+            order.append(node)
+            for linked in unblocks.get(node, ()):
+                pending[linked] -= 1
+                if not pending[linked]:
+                    heapq.heappush(ready, linked)
+
+        if len(order) != len(pending):
+            visited = set(order)
+            cycle = sorted(node for node in pending if node not in visited)
+            raise Exception(f"Graph contains a cycle involving: {cycle}")
+        return tuple(order)
 
     def visit_postorder(self):
         """
         Generate a sequence of nodes in postorder, such that every node is
         visited *after* any nodes it links to.
 
-        Behavior is undefined (read: it will hang) if the graph contains a
-        cycle.
+        Raises an exception if the graph contains a cycle.
         """
-        return self._visit(False)
+        return iter(self._postorder)
 
     def visit_preorder(self):
         """
         Like visit_postorder, but in reverse: evrey node is visited *before*
         any nodes it links to.
         """
-        return self._visit(True)
+        return iter(self._preorder)
 
     def links_dict(self):
         """
@@ -114,16 +114,87 @@ FORMAT_METHODS = {
 }
 
 
-def get_taskgraph_generator(root, parameters):
+def get_taskgraph_generator(
+    root, parameters, use_cache=False, reuse_kinds=None, use_hash_cache=False
+):
     """Helper function to make testing a little easier."""
     from taskgraph.generator import TaskGraphGenerator
+    from taskgraph.util import hash
+    from taskgraph.util.kind_cache import KindCache
+    from taskgraph.util.lookup_cache import LookupCache
+
+    cache_dir = appdirs.user_cache_dir("taskgraph")
+    kind_cache = None
+    if use_cache:
+        kind_cache = KindCache(os.path.join(cache_dir, "kinds"))
+    if use_hash_cache:
+        hash.hash_cache = LookupCache(
+            os.path.join(cache_dir, "hashes.sqlite"), hash.HASH_CACHE_TTL
+        )
+    return TaskGraphGenerator(
+        root_dir=root,
+        parameters=parameters,
+        kind_cache=kind_cache,
+        reuse_kinds=reuse_kinds,
+    )
+
+
+def get_affected_kinds(root, paths):
+    """
+    Determine which kinds may generate different tasks after the files in
+    `paths` change, including the kinds that depend on them.
 
-    return TaskGraphGenerator(root_dir=root, parameters=parameters)
+    Changes to a kind's directory affect that kind, and changes to Taskgraph's
+    own Python files affect the kinds whose loader or transforms come from
+    Taskgraph. Any other change, including to Python files under `root`
+    (which may be imported from any kind's transforms), might affect every
+    kind.
+
+    Args:
+        root (str): Root directory of the Taskgraph configuration.
+        paths (iterable): Absolute paths to the changed files.
+
+    Returns:
+        set: Names of the affected kinds.
+    """
+    import taskgraph
+    from taskgraph.graph import Graph
+    from taskgraph.util.kind_cache import get_kind_packages
+    from taskgraph.util.yaml import load_yaml
+
+    root = os.path.realpath(root)
+    kinds_dir = os.path.join(root, "kinds")
+    taskgraph_dir = os.path.dirname(os.path.realpath(taskgraph.__file__))
+
+    configs = {}
+    for name in os.listdir(kinds_dir):
+        kind_yml = os.path.join(kinds_dir, name, "kind.yml")
+        if os.path.exists(kind_yml):
+            configs[name] = load_yaml(kind_yml)
+    packages = {name: get_kind_packages(config) for name, config in configs.items()}
+
+    affected = set()
+    for path in map(os.path.realpath, paths):
+        if path.startswith(kinds_dir + os.sep):
+            affected.add(os.path.relpath(path, kinds_dir).split(os.sep)[0])
+        elif path.endswith(".py") and path.startswith(taskgraph_dir + os.sep):
+            affected.update(k for k, p in packages.items() if "taskgraph" in p)
+        else:
+            return set(configs)
+
+    edges = {
+        (name, dep, "kind-dependency")
+        for name, config in configs.items()
+        for dep in config.get("kind-dependencies", [])
+        if dep in configs
+    }
+    kind_graph = Graph(set(configs), edges)  # type: ignore
+    return kind_graph.transitive_closure(affected & set(configs), reverse=True).nodes
 
 
 def format_taskgraph(options, parameters, overrides, logfile=None):
     import taskgraph
-    from taskgraph.parameters import parameters_loader
+    from taskgraph.parameters import Parameters, parameters_loader
 
     if logfile:
         handler = logging.FileHandler(logfile, mode="w")
@@ -136,6 +207,16 @@ def format_taskgraph(options, parameters, overrides, logfile=None):
     if options["fast"]:
         taskgraph.fast = True
 
+    if options.get("lookup_cache_ttl"):
+        from taskgraph.util import taskcluster
+        from taskgraph.util.lookup_cache import LookupCache
+
+        taskcluster.lookup_cache = LookupCache(
+            os.path.join(appdirs.user_cache_dir("taskgraph"), "lookups.sqlite"),
+            options["lookup_cache_ttl"],
+        )
+
+    spec = parameters
     if isinstance(parameters, str):
         parameters = parameters_loader(
             parameters,
@@ -143,9 +224,52 @@ def format_taskgraph(options, parameters, overrides, logfile=None):
             strict=False,
         )
 
-    tgg = get_taskgraph_generator(options.get("root"), parameters)
+    # When diffing incrementally, the run at the current revision records the
+    # kind cache key of each kind so the run at the base revision can reuse
+    # the tasks of unaffected kinds. It also records its parameters, which the
+    # run at the base revision uses in place of its own: kinds are only reused
+    # when the parameters match, and the defaults (e.g `head_rev`) differ
+    # between revisions.
+    kind_keys_path = None
+    params_path = None
+    reuse_kinds = None
+    if options.get("kind_keys_dir"):
+        name = Parameters.format_spec(spec if isinstance(spec, str) else None)
+        kind_keys_path = os.path.join(options["kind_keys_dir"], f"{name}.json")
+        params_path = os.path.join(options["kind_keys_dir"], f"{name}-parameters.json")
+        if options.get("affected_kinds") is not None:
+            if os.path.isfile(kind_keys_path):
+                with open(kind_keys_path) as fh:
+                    kind_keys = json.load(fh)
+                reuse_kinds = {
+                    k: v
+                    for k, v in kind_keys.items()
+                    if k not in options["affected_kinds"]
+                }
+            if os.path.isfile(params_path):
+                parameters = parameters_loader(
+                    params_path,
+                    overrides=dict(overrides),
+                    strict=False,
+                )
+            kind_keys_path = params_path = None
+
+    tgg = get_taskgraph_generator(
+        options.get("root"),
+        parameters,
+        # incremental diffs rely on the kind cache
+        options.get("cache", True)
+        and (options.get("kind_cache", False) or bool(options.get("kind_keys_dir"))),
+        reuse_kinds,
+        options.get("hash_cache", False),
+    )
 
     tg = getattr(tgg, options["graph_attr"])
+    if kind_keys_path:
+        with open(kind_keys_path, "w") as fh:
+            json.dump(tgg.kind_cache_keys, fh)
+        with open(params_path, "w") as fh:  # type: ignore
+            json.dump(dict(tgg.parameters), fh)
     tg = get_filtered_taskgraph(tg, options["tasks_regex"], options["exclude_keys"])
     format_method = FORMAT_METHODS[options["format"] or "labels"]
     return format_method(tg)
@@ -348,6 +472,39 @@ def generate_taskgraph(options, parameters, overrides, logdir):
     action="store_true",
     help="enable fast task generation for local debugging.",
 )
+@argument(
+    "--kind-cache",
+    dest="kind_cache",
+    default=False,
+    action="store_true",
+    help="Reuse the tasks generated for unchanged kinds by previous runs. The "
+    "cache key doesn't cover files read by transforms outside of the kind "
+    "directory (e.g Docker contexts), so don't use this while modifying them.",
+)
+@argument(
+    "--no-cache",
+    dest="cache",
+    default=True,
+    action="store_false",
+    help="Don't reuse the tasks generated by previous runs, even with " "--kind-cache.",
+)
+@argument(
+    "--no-hash-cache",
+    dest="hash_cache",
+    default=True,
+    action="store_false",
+    help="Don't reuse the hashes of unchanged files computed by previous runs.",
+)
+@argument(
+    "--lookup-cache-ttl",
+    dest="lookup_cache_ttl",
+    default=None,
+    type=int,
+    metavar="SECONDS",
+    help="Cache the results of index and task status lookups on disk for up to "
+    "SECONDS, so they are reused by subsequent runs. Only statuses of resolved "
+    "tasks are cached, and never past the expiry of the task.",
+)
 @argument(
     "--diff",
     const="default",
@@ -357,6 +514,15 @@ def generate_taskgraph(options, parameters, overrides, logdir):
     "Without args the base revision will be used. A revision specifier such as "
     "the hash or `.~1` (hg) or `HEAD~1` (git) can be used as well.",
 )
+@argument(
+    "--incremental",
+    default=False,
+    action="store_true",
+    help="With --diff, only regenerate the kinds affected by the files changed "
+    "between the two revisions (and the kinds depending on them) at the base "
+    "revision, reusing the tasks generated at the current revision for the "
+    "others. This uses the kind cache (see --kind-cache).",
+)
 @argument(
     "-j",
     "--max-workers",
@@ -381,6 +547,10 @@ def show_taskgraph(options):
     if options["diff"] or options["force_local_files_changed"]:
         repo = get_repository(os.getcwd())
 
+    if options.get("incremental") and not options["cache"]:
+        print("abort: --incremental relies on the kind cache", file=sys.stderr)
+        return 1
+
     if options["diff"]:
         assert repo is not None
         if not repo.working_directory_clean():
@@ -447,6 +617,11 @@ def show_taskgraph(options):
         # to setup its `mach` based logging.
         setup_logging()
 
+    if options["diff"] and options.get("incremental"):
+        assert diffdir is not None
+        options["kind_keys_dir"] = os.path.join(diffdir, "kind-keys")
+        os.makedirs(options["kind_keys_dir"])
+
     ret = generate_taskgraph(options, parameters, overrides, logdir)
 
     if options["diff"]:
@@ -464,6 +639,21 @@ def show_taskgraph(options):
             base_rev = options["diff"]
         base_rev_file = base_rev.replace("/", "_")
 
+        if options.get("kind_keys_dir"):
+            head_rev = repo.head_rev
+            changed_files = set(
+                repo.get_changed_files("ADM", rev=head_rev, base_rev=base_rev)
+            ) | set(repo.get_changed_files("ADM", rev=base_rev, base_rev=head_rev))
+            affected = get_affected_kinds(
+                options.get("root") or "taskcluster",
+                [os.path.join(repo.path, f) for f in changed_files],
+            )
+            options["affected_kinds"] = sorted(affected)
+            print(
+                f"Regenerating {len(affected)} affected kinds @ {base_rev}",
+                file=sys.stderr,
+            )
+
         try:
             repo.update(base_rev)
             base_rev = repo.head_rev[:12]
@@ -570,14 +760,30 @@ def show_taskgraph(options):
     "with this option it will only build the context.tar.",
     metavar="context.tar",
 )
+@argument(
+    "--compression-threads",
+    type=int,
+    help="Compress the context with this many threads (0 for one per CPU).",
+    metavar="N",
+)
 def build_image(args):
     from taskgraph.docker import build_context, build_image
 
     validate_docker()
     if args["context_only"] is None:
-        build_image(args["image_name"], args["tag"], os.environ)
+        build_image(
+            args["image_name"],
+            args["tag"],
+            os.environ,
+            compression_threads=args["compression_threads"],
+        )
     else:
-        build_context(args["image_name"], args["context_only"], os.environ)
+        build_context(
+            args["image_name"],
+            args["context_only"],
+            os.environ,
+            compression_threads=args["compression_threads"],
+        )
 
 
 @command(
@@ -700,6 +906,14 @@ def image_digest(args):
 @argument(
     "--verbose", "-v", action="store_true", help="include debug-level logging output"
 )
+@argument(
+    "--kind-workers",
+    dest="kind_workers",
+    default=None,
+    type=int,
+    help="Load kinds that don't depend on each other concurrently, using up to "
+    "this many worker processes.",
+)
 def decision(options):
     from taskgraph.decision import taskgraph_decision
 
@@ -20,7 +20,11 @@ from slugid import nice as slugid
 
 from taskgraph.graph import Graph
 from taskgraph.taskgraph import TaskGraph
-from taskgraph.util.parameterization import resolve_task_references, resolve_timestamps
+from taskgraph.util.parameterization import (
+    find_task_references,
+    resolve_task_references,
+    resolve_timestamps,
+)
 from taskgraph.util.python_path import import_sibling_modules
 from taskgraph.util.taskcluster import find_task_id_batched, status_task_batched
 
@@ -52,10 +56,6 @@ def optimize_task_graph(
     Perform task optimization, returning a taskgraph and a map from label to
     assigned taskId, including replacement tasks.
     """
-    # avoid circular import
-    from taskgraph.optimize.strategies import IndexSearch
-
-    label_to_taskid = {}
     if not existing_tasks:
         existing_tasks = {}
 
@@ -66,6 +66,42 @@ def optimize_task_graph(
 
     optimizations = _get_optimizations(target_task_graph, strategies)
 
+    # Let each strategy, including any nested in composite strategies, see the
+    # arguments of all the tasks it will be called for during this run
+    run_args = {}
+    for label in target_task_graph.graph.nodes:
+        if label in do_not_optimize:
+            continue
+        _, strategy, arg = optimizations(label)
+        for sub, sub_arg in _iter_strategies(strategy, arg):
+            run_args.setdefault(id(sub), (sub, []))[1].append(sub_arg)
+    for strategy, args in run_args.values():
+        strategy.begin_run(params, args)
+    try:
+        return _optimize_task_graph(
+            target_task_graph,
+            requested_tasks,
+            params,
+            do_not_optimize,
+            decision_task_id,
+            existing_tasks,
+            optimizations,
+        )
+    finally:
+        for strategy, _ in run_args.values():
+            strategy.end_run()
+
+
+def _optimize_task_graph(
+    target_task_graph,
+    requested_tasks,
+    params,
+    do_not_optimize,
+    decision_task_id,
+    existing_tasks,
+    optimizations,
+):
+    label_to_taskid = {}
     removed_tasks = remove_tasks(
         target_task_graph=target_task_graph,
         requested_tasks=requested_tasks,
@@ -74,14 +110,14 @@ def optimize_task_graph(
         do_not_optimize=do_not_optimize,
     )
 
-    # Gather each relevant task's index
+    # Gather the index paths each strategy, including any nested in composite
+    # strategies, will look up
     indexes = set()
     for label in target_task_graph.graph.visit_postorder():
         if label in do_not_optimize:
             continue
         _, strategy, arg = optimizations(label)
-        if isinstance(strategy, IndexSearch) and arg is not None:
-            indexes.update(arg)
+        indexes.update(strategy.index_paths(arg))
 
     index_to_taskid = {}
     taskid_to_status = {}
@@ -101,6 +137,7 @@ def optimize_task_graph(
         removed_tasks=removed_tasks,
         index_to_taskid=index_to_taskid,
         taskid_to_status=taskid_to_status,
+        index_paths=indexes,
     )
 
     return (
@@ -130,6 +167,17 @@ def _get_optimizations(target_task_graph, strategies):
     return optimizations
 
 
+def _iter_strategies(strategy, arg):
+    """Yield `strategy` along with `arg`, followed by the substrategies nested
+    in it along with their own arguments."""
+    yield strategy, arg
+    if isinstance(strategy, CompositeStrategy):
+        for sub, sub_arg in zip(
+            strategy.substrategies, strategy.split_args(arg, strategy.substrategies)
+        ):
+            yield from _iter_strategies(sub, sub_arg)
+
+
 def _log_optimization(verb, opt_counts, opt_reasons=None):
     if opt_reasons:
         message = "optimize: {label} {action} because of {reason}"
@@ -284,20 +332,65 @@ def replace_tasks(
     existing_tasks,
     index_to_taskid,
     taskid_to_status,
+    index_paths=None,
 ):
     """
     Implement the "Replacing Tasks" phase, returning a set of task labels of
     all replaced tasks. The replacement taskIds are added to label_to_taskid as
     a side-effect.
-    """
-    # avoid circular import
-    from taskgraph.optimize.strategies import IndexSearch
 
+    `index_to_taskid` and `taskid_to_status` hold the results of the batched
+    lookups of `index_paths` (by default, only the keys of `index_to_taskid`);
+    index paths missing from `index_to_taskid` were not found.
+    """
     opt_counts = defaultdict(int)
     replaced = set()
     dependents_of = target_task_graph.graph.reverse_links_dict()
     dependencies_of = target_task_graph.graph.links_dict()
 
+    # hand the results of the batched index lookups to the strategies
+    strategies = {}
+    for label in target_task_graph.tasks:
+        strategy = optimizations(label)[1]
+        strategies[id(strategy)] = strategy
+    strategies = list(strategies.values())
+    for strategy in strategies:
+        strategy.set_index_lookups(index_to_taskid, taskid_to_status or {}, index_paths)
+    try:
+        _replace_tasks(
+            target_task_graph,
+            params,
+            optimizations,
+            do_not_optimize,
+            label_to_taskid,
+            removed_tasks,
+            existing_tasks,
+            opt_counts,
+            replaced,
+            dependents_of,
+            dependencies_of,
+        )
+    finally:
+        for strategy in strategies:
+            strategy.set_index_lookups(None, None)
+
+    _log_optimization("replaced", opt_counts)
+    return replaced
+
+
+def _replace_tasks(
+    target_task_graph,
+    params,
+    optimizations,
+    do_not_optimize,
+    label_to_taskid,
+    removed_tasks,
+    existing_tasks,
+    opt_counts,
+    replaced,
+    dependents_of,
+    dependencies_of,
+):
     for label in target_task_graph.graph.visit_postorder():
         logger.debug(f"replace_tasks: {label}")
         # if we're not allowed to optimize, that's easy..
@@ -336,9 +429,6 @@ def replace_tasks(
                 resolve_timestamps(now, task.task["deadline"]) for task in dependents  # type: ignore
             )
 
-        if isinstance(opt, IndexSearch):
-            arg = arg, index_to_taskid, taskid_to_status
-
         repl = opt.should_replace_task(task, params, deadline, arg)
         if repl:
             if repl is True:
@@ -357,9 +447,6 @@ def replace_tasks(
         else:
             logger.debug(f"replace_tasks: {label} kept by optimization strategy")
 
-    _log_optimization("replaced", opt_counts)
-    return replaced
-
 
 def get_subgraph(
     target_task_graph,
@@ -421,15 +508,20 @@ def get_subgraph(
                 }
             )
 
+        # The task definition is still walked to find the references, but
+        # only the containers along the path to each of them are copied, the
+        # rest is shared with the target task graph.
         task.task = resolve_task_references(
             task.label,
             task.task,
             task_id=task.task_id,
             decision_task_id=decision_task_id,
             dependencies=named_task_dependencies,
+            paths=find_task_references(task.task),
         )
-        deps = task.task.setdefault("dependencies", [])  # type: ignore
+        deps = list(task.task.get("dependencies", []))  # type: ignore
         deps.extend(sorted(named_task_dependencies.values()))
+        task.task["dependencies"] = deps  # type: ignore
         tasks_by_taskid[task.task_id] = task
 
     # resolve edges to taskIds
@@ -450,6 +542,10 @@ def get_subgraph(
 
 @register_strategy("never")
 class OptimizationStrategy:
+    # results shared by the tasks of the current optimization run, None
+    # outside of a run
+    run_cache = None
+
     def should_remove_task(self, task, params, arg):
         """Determine whether to optimize this task by removing it.  Returns
         True to remove."""
@@ -461,6 +557,36 @@ class OptimizationStrategy:
         keep the task."""
         return False
 
+    def index_paths(self, arg):
+        """Return the index paths `should_replace_task` will look up for a task
+        with the optimization argument `arg`.
+
+        The optimizer resolves the index paths of every task in batches ahead
+        of the replacing phase, and hands the results to
+        `set_index_lookups`."""
+        return ()
+
+    def set_index_lookups(self, index_to_taskid, taskid_to_status, index_paths=None):
+        """Receive the results of the batched lookups of `index_paths` (by
+        default, the keys of `index_to_taskid`) made for the replacing phase,
+        or None for all of them once that phase is over."""
+
+    def begin_run(self, params, args):
+        """Prepare for an optimization run with the given parameters, where
+        `args` holds the optimization argument of every task this strategy
+        will be called for, whether directly or nested in composite
+        strategies.
+
+        The default implementation empties `run_cache`, in which results
+        depending only on the parameters and the optimization argument can be
+        memoized (or computed for all the tasks at once) for the duration of
+        the run."""
+        self.run_cache = {}
+
+    def end_run(self):
+        """Drop anything kept for the optimization run once it is over."""
+        self.run_cache = None
+
 
 @register_strategy("always")
 class Always(OptimizationStrategy):
@@ -518,6 +644,18 @@ class CompositeStrategy(OptimizationStrategy, metaclass=ABCMeta):
         results = self._generate_results("should_replace_task", *args)
         return self.reduce(results)
 
+    def index_paths(self, arg):
+        paths = []
+        for sub, sub_arg in zip(
+            self.substrategies, self.split_args(arg, self.substrategies)
+        ):
+            paths.extend(sub.index_paths(sub_arg))
+        return paths
+
+    def set_index_lookups(self, index_to_taskid, taskid_to_status, index_paths=None):
+        for sub in self.substrategies:
+            sub.set_index_lookups(index_to_taskid, taskid_to_status, index_paths)
+
 
 class Any(CompositeStrategy):
     """Given one or more optimization strategies, remove or replace a task if any of them
@@ -2,7 +2,7 @@ import logging
 from datetime import datetime
 
 from taskgraph.optimize.base import OptimizationStrategy, register_strategy
-from taskgraph.util.path import match as match_path
+from taskgraph.util.path import PatternMatcher
 from taskgraph.util.taskcluster import find_task_id, status_task
 
 logger = logging.getLogger("optimization")
@@ -22,9 +22,27 @@ class IndexSearch(OptimizationStrategy):
 
     fmt = "%Y-%m-%dT%H:%M:%S.%fZ"
 
+    # results of the lookups batched by the optimizer, if any
+    _index_to_taskid = None
+    _taskid_to_status = None
+    _looked_up = frozenset()
+
+    def index_paths(self, arg):
+        if isinstance(arg, tuple) and len(arg) == 3:
+            return arg[0]
+        return arg or ()
+
+    def set_index_lookups(self, index_to_taskid, taskid_to_status, index_paths=None):
+        self._index_to_taskid = index_to_taskid
+        self._taskid_to_status = taskid_to_status
+        if index_paths is None:
+            index_paths = index_to_taskid or ()
+        self._looked_up = frozenset(index_paths)
+
     def should_replace_task(self, task, params, deadline, arg):
         "Look for a task with one of the given index paths"
         batched = False
+        looked_up = frozenset()
         # Appease static checker that doesn't understand that this is not needed
         label_to_taskid = {}
         taskid_to_status = {}
@@ -36,10 +54,18 @@ class IndexSearch(OptimizationStrategy):
             batched = True
         else:
             index_paths = arg
+            # use the lookups batched by the optimizer, if any, and only look
+            # up the index paths they didn't cover individually
+            if self._index_to_taskid is not None:
+                label_to_taskid = self._index_to_taskid
+                taskid_to_status = self._taskid_to_status
+                looked_up = self._looked_up
 
         for index_path in index_paths:
             try:
-                if batched:
+                # paths missing from batched lookups weren't found, and
+                # raise `KeyError`
+                if batched or index_path in looked_up:
                     task_id = label_to_taskid[index_path]
                     status = taskid_to_status[task_id]
                 else:
@@ -73,19 +99,36 @@ class IndexSearch(OptimizationStrategy):
 @register_strategy("skip-unless-changed")
 class SkipUnlessChanged(OptimizationStrategy):
 
+    def begin_run(self, params, args):
+        super().begin_run(params, args)
+        if "files_changed" not in params:
+            return
+        # Many tasks share the same patterns, so match the patterns of all the
+        # tasks against the changed files at once, up front
+        patterns = {p for arg in args for p in arg or ()}
+        matcher = PatternMatcher(patterns)
+        self.run_cache["changed"] = matcher.match_any(params["files_changed"])
+
     def check(self, files_changed, patterns):
-        for pattern in patterns:
-            for path in files_changed:
-                if match_path(path, pattern):
-                    return True
-        return False
+        matcher = PatternMatcher(patterns)
+        return any(matcher.matches(path) for path in files_changed)
+
+    def _check_run(self, files_changed, patterns):
+        if not self.run_cache or "changed" not in self.run_cache:
+            return self.check(files_changed, patterns)
+
+        key = ("patterns", tuple(patterns))
+        if key not in self.run_cache:
+            changed = self.run_cache["changed"]
+            self.run_cache[key] = any(p in changed for p in patterns)
+        return self.run_cache[key]
 
     def should_remove_task(self, task, params, file_patterns):
         # pushlog_id == -1 - this is the case when run from a cron.yml job or on a git repository
         if params.get("repository_type") == "hg" and params.get("pushlog_id") == -1:
             return False
 
-        changed = self.check(params["files_changed"], file_patterns)
+        changed = self._check_run(params["files_changed"], file_patterns)
         if not changed:
             logger.debug(
                 f'no files found matching a pattern in `skip-unless-changed` for "{task.label}"'
@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import functools
 import gzip
 import hashlib
 import json
@@ -222,6 +223,16 @@ class Parameters(ReadOnlyDict):
         except Exception as e:
             raise ParameterMismatch(str(e))
 
+    def __reduce__(self):
+        """
+        Support for `pickle`, preserving strictness and the spec.
+        """
+        return (
+            functools.partial(self.__class__, **dict(self)),
+            (),
+            {"strict": self.strict, "spec": self.spec},
+        )
+
     def __getitem__(self, k):
         try:
             return super().__getitem__(k)
@@ -2,6 +2,8 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import json
+from collections.abc import MutableMapping, Set
 from dataclasses import dataclass
 from typing import List
 
@@ -43,30 +45,156 @@ class TaskGraph:
         "Iterate over tasks in undefined order"
         return iter(self.tasks.values())  # type: ignore
 
-    def to_json(self):
-        "Return a JSON-able object representing the task graph, as documented"
+    def _task_json(self, key, named_links_dict):
+        task_json = self.tasks[key].to_json()
+        # overwrite dependencies with the information in the taskgraph's edges.
+        task_json["dependencies"] = named_links_dict.get(key, {})
+        return task_json
+
+    def iter_json(self):
+        """Generate `(key, task_json)` pairs for each task in postorder, as
+        found in the result of `to_json`, without building the whole
+        dictionary."""
         named_links_dict = self.graph.named_links_dict()
         # this dictionary may be keyed by label or by taskid, so let's just call it 'key'
-        tasks = {}
         for key in self.graph.visit_postorder():
-            tasks[key] = self.tasks[key].to_json()
-            # overwrite dependencies with the information in the taskgraph's edges.
-            tasks[key]["dependencies"] = named_links_dict.get(key, {})
-        return tasks
+            yield key, self._task_json(key, named_links_dict)
+
+    def to_json(self):
+        "Return a JSON-able object representing the task graph, as documented"
+        return dict(self.iter_json())
+
+    def write_json(self, fh, compact=False):
+        """Serialize the result of `to_json` to the text file `fh`, one task at
+        a time.
+
+        The output is identical to that of ``json.dump(self.to_json(), fh,
+        sort_keys=True, indent=2, separators=(",", ": "))``, or, if `compact`
+        is true, to ``json.dump(self.to_json(), fh, sort_keys=True,
+        separators=(",", ":"))``.
+        """
+        if compact:
+            kwargs = {"separators": (",", ":")}
+            opening, separator, closing = "{", ",", "}"
+        else:
+            kwargs = {"indent": 2, "separators": (",", ": ")}
+            opening, separator, closing = "{\n  ", ",\n  ", "\n}"
+
+        if not self.tasks:
+            fh.write("{}")
+            return
+
+        named_links_dict = self.graph.named_links_dict()
+        fh.write(opening)
+        for i, key in enumerate(sorted(self.tasks)):
+            if i:
+                fh.write(separator)
+            task_json = json.dumps(
+                self._task_json(key, named_links_dict), sort_keys=True, **kwargs
+            )
+            if not compact:
+                # nest the task one level deeper
+                task_json = task_json.replace("\n", "\n  ")
+            fh.write(f"{json.dumps(key)}{kwargs['separators'][1]}{task_json}")
+        fh.write(closing)
 
     @classmethod
-    def from_json(cls, tasks_dict):
+    def from_json(cls, tasks_dict, lazy=False):
         """
         This code is used to generate the a TaskGraph using a dictionary
         which is representative of the TaskGraph.
+
+        If `lazy` is true, `Task` objects are only created from `tasks_dict`
+        when first accessed, and the graph's edges are read from the tasks'
+        dependencies when first needed. This makes loading a large graph to
+        operate on a handful of its tasks cheap. `tasks_dict` must not be
+        modified afterwards.
         """
+        if lazy:
+            tasks = _LazyTasks(tasks_dict)
+            graph = Graph(frozenset(tasks_dict), _LazyEdges(tasks_dict))
+            return tasks, cls(tasks, graph)  # type: ignore
+
         tasks = {}
         edges = set()
         for key, value in tasks_dict.items():
-            tasks[key] = Task.from_json(value)
-            if "task_id" in value:
-                tasks[key].task_id = value["task_id"]
+            tasks[key] = _task_from_json(value)
             for depname, dep in value["dependencies"].items():
                 edges.add((key, dep, depname))
         task_graph = cls(tasks, Graph(set(tasks), edges))  # type: ignore
         return tasks, task_graph
+
+
+def _task_from_json(value):
+    task = Task.from_json(value)
+    if "task_id" in value:
+        task.task_id = value["task_id"]
+    return task
+
+
+class _LazyTasks(MutableMapping):
+    """A mapping of keys to the `Task` objects described by the values of
+    `tasks_dict`, each created on first access. The first modification
+    creates all the remaining tasks, after which `tasks_dict` is no longer
+    used."""
+
+    def __init__(self, tasks_dict):
+        self._tasks_dict = tasks_dict
+        self._tasks = {}
+
+    def _materialize(self):
+        if self._tasks_dict is not self._tasks:
+            self._tasks = {key: self[key] for key in self._tasks_dict}
+            self._tasks_dict = self._tasks
+
+    def __getitem__(self, key):
+        try:
+            return self._tasks[key]
+        except KeyError:
+            task = self._tasks[key] = _task_from_json(self._tasks_dict[key])
+            return task
+
+    def __setitem__(self, key, task):
+        self._materialize()
+        self._tasks[key] = task
+
+    def __delitem__(self, key):
+        self._materialize()
+        del self._tasks[key]
+
+    def __contains__(self, key):
+        return key in self._tasks_dict
+
+    def __iter__(self):
+        return iter(self._tasks_dict)
+
+    def __len__(self):
+        return len(self._tasks_dict)
+
+
+class _LazyEdges(Set):
+    """The set of `(left, right, name)` edges described by the dependencies of
+    the values of `tasks_dict`, without building it."""
+
+    def __init__(self, tasks_dict):
+        self._tasks_dict = tasks_dict
+
+    def __contains__(self, edge):
+        left, right, name = edge
+        task = self._tasks_dict.get(left)
+        return task is not None and task["dependencies"].get(name) == right
+
+    def __iter__(self):
+        for key, value in self._tasks_dict.items():
+            for depname, dep in value["dependencies"].items():
+                yield key, dep, depname
+
+    def __len__(self):
+        return sum(len(value["dependencies"]) for value in self._tasks_dict.values())
+
+    @classmethod
+    def _from_iterable(cls, it):
+        # results of set operations (`|`, `-`, `&`, ...) can't be lazy
+        return frozenset(it)
+
+    __hash__ = Set._hash
@@ -140,6 +140,9 @@ class TransformSequence:
 class ValidateSchema:
     schema: Schema
 
+    # Every task is validated. Tasks of kinds whose inputs haven't changed
+    # since a previous run don't go through the transforms at all when the
+    # kind cache is used (see `taskgraph.util.kind_cache`).
     def __call__(self, config, tasks):
         for task in tasks:
             if "name" in task:
@@ -1,12 +1,12 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
-import copy
 from textwrap import dedent
 
 from voluptuous import ALLOW_EXTRA, Optional, Required
 
 from taskgraph.transforms.base import TransformSequence
+from taskgraph.util.copy import deepcopy
 from taskgraph.util.schema import Schema
 from taskgraph.util.templates import substitute
 
@@ -60,7 +60,7 @@ def chunk_tasks(config, tasks):
         total_chunks = chunk_config["total-chunks"]
 
         for this_chunk in range(1, total_chunks + 1):
-            subtask = copy.deepcopy(task)
+            subtask = deepcopy(task)
 
             subs = {
                 "this_chunk": this_chunk,
@@ -75,7 +75,7 @@ def chunk_tasks(config, tasks):
                     f, subfield = subfield.split(".", 1)
                     container = container[f]
 
-                subcontainer = copy.deepcopy(container[subfield])
+                subcontainer = container[subfield]
                 subfield = substitute(subfield, **subs)
                 container[subfield] = substitute(subcontainer, **subs)
 
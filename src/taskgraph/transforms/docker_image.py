@@ -7,6 +7,8 @@ import json
 import logging
 import os
 import re
+from concurrent import futures
+from functools import partial
 
 from voluptuous import Optional, Required
 
@@ -64,6 +66,29 @@ docker_image_schema = Schema(
 transforms.add_validate(docker_image_schema)
 
 
+def get_context_hash(config, topsrcdir, task):
+    """Return the hash of the context of the docker image built by `task`,
+    writing the context archive along the way if artifacts are written."""
+    image_name = task["name"]
+    context_path = os.path.join(
+        "taskcluster", "docker", task.get("definition", image_name)
+    )
+    args = task.get("args", {})
+    if config.write_artifacts:
+        context_file = os.path.join(CONTEXTS_DIR, f"{image_name}.tar.gz")
+        logger.info(f"Writing {context_file} for docker image {image_name}")
+        return create_context_tar(
+            topsrcdir,
+            context_path,
+            context_file,
+            args,
+            compression_threads=config.graph_config["taskgraph"].get(
+                "context-compression-threads"
+            ),
+        )
+    return generate_context_hash(topsrcdir, context_path, args)
+
+
 @transforms.add
 def fill_template(config, tasks):
     available_packages = set()
@@ -77,15 +102,27 @@ def fill_template(config, tasks):
 
     tasks = list(tasks)
 
-    if not taskgraph.fast and config.write_artifacts:
-        if not os.path.isdir(CONTEXTS_DIR):
+    if not taskgraph.fast:
+        if config.write_artifacts and not os.path.isdir(CONTEXTS_DIR):
             os.makedirs(CONTEXTS_DIR)
 
+        # Most of the time hashing contexts is spent reading, hashing and
+        # compressing files, which releases the GIL, so handle all the images
+        # at once.
+        topsrcdir = os.path.dirname(config.graph_config.taskcluster_yml)
+        with futures.ThreadPoolExecutor() as e:
+            context_hashes = dict(
+                zip(
+                    [task["name"] for task in tasks],
+                    e.map(partial(get_context_hash, config, topsrcdir), tasks),
+                )
+            )
+
     for task in tasks:
         image_name = task.pop("name")
         job_symbol = task.pop("symbol", None)
         args = task.pop("args", {})
-        definition = task.pop("definition", image_name)
+        task.pop("definition", None)
         packages = task.pop("packages", [])
         parent = task.pop("parent", None)
 
@@ -96,26 +133,13 @@ def fill_template(config, tasks):
                 )
 
         if not taskgraph.fast:
-            context_path = os.path.join("taskcluster", "docker", definition)
-            topsrcdir = os.path.dirname(config.graph_config.taskcluster_yml)
-            if config.write_artifacts:
-                context_file = os.path.join(CONTEXTS_DIR, f"{image_name}.tar.gz")
-                logger.info(f"Writing {context_file} for docker image {image_name}")
-                context_hash = create_context_tar(
-                    topsrcdir,
-                    context_path,
-                    context_file,
-                    args,
-                )
-            else:
-                context_hash = generate_context_hash(topsrcdir, context_path, args)
+            context_hash = context_hashes[image_name]
         else:
             if config.write_artifacts:
                 raise Exception("Can't write artifacts if `taskgraph.fast` is set.")
             context_hash = "0" * 40
         digest_data = [context_hash]
         digest_data += [json.dumps(args, sort_keys=True)]
-        context_hashes[image_name] = context_hash
 
         description = f"Build the docker image {image_name} for use by dependent tasks"
 
@@ -10,7 +10,6 @@ These transforms are useful when follow-up tasks are needed for some
 indeterminate subset of existing tasks. For example, running a signing task
 after each build task, whatever builds may exist.
 """
-from copy import deepcopy
 from textwrap import dedent
 
 from voluptuous import Any, Extra, Optional, Required
@@ -18,6 +17,7 @@ from voluptuous import Any, Extra, Optional, Required
 from taskgraph.transforms.base import TransformSequence
 from taskgraph.transforms.run import fetches_schema
 from taskgraph.util.attributes import attrmatch
+from taskgraph.util.copy import deepcopy
 from taskgraph.util.dependencies import GROUP_BY_MAP, get_dependencies
 from taskgraph.util.schema import Schema, validate_schema
 from taskgraph.util.set_name import SET_NAME_MAP
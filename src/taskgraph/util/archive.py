@@ -3,14 +3,24 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import collections
 import gzip
 import os
 import stat
+import struct
 import tarfile
+import zlib
+from concurrent import futures
 
 # 2016-01-01T00:00:00+0000
 DEFAULT_MTIME = 1451606400
 
+# size of the blocks `ParallelGzipFile` compresses independently
+PARALLEL_BLOCK_SIZE = 128 * 1024
+
+# size of the tail of the previous block each block is primed with
+PARALLEL_DICT_SIZE = 32 * 1024
+
 
 # Python 3.9 contains this change:
 #  https://github.com/python/cpython/commit/674935b8caf33e47c78f1b8e197b1b77a04992d2
@@ -104,7 +114,101 @@ def create_tar_from_files(fp, files):
             tf.addfile(ti, f)
 
 
-def create_tar_gz_from_files(fp, files, filename=None, compresslevel=9):
+def _deflate_block(block, zdict, compresslevel):
+    c = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    # a sync flush ends the block on a byte boundary without ending the
+    # stream, so blocks can be concatenated
+    return c.compress(block) + c.flush(zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipFile:
+    """A write-only file object compressing the written data to gzip with
+    several threads, in the same way as pigz.
+
+    The data is split into blocks of ``PARALLEL_BLOCK_SIZE`` bytes, which are
+    compressed concurrently (zlib releases the GIL) into parts of a single
+    deflate stream, each primed with the end of the block before it.
+
+    The output only depends on the data, `filename`, `compresslevel` and
+    `mtime`, and not on the number of threads. It differs from the output of
+    ``gzip.GzipFile`` though.
+    """
+
+    def __init__(
+        self, fileobj, filename="", compresslevel=9, mtime=DEFAULT_MTIME, threads=0
+    ):
+        self.fileobj = fileobj
+        self.compresslevel = compresslevel
+        self._threads = threads or os.cpu_count() or 1
+        self._executor = futures.ThreadPoolExecutor(self._threads)
+        self._pending = collections.deque()
+        self._buf = bytearray()
+        self._zdict = b""
+        self._crc = 0
+        self._size = 0
+
+        # same header as gzip.GzipFile
+        fname = os.path.basename(filename)
+        if fname.endswith(".gz"):
+            fname = fname[:-3]
+        fname = fname.encode("latin-1")
+        xfl = {9: 2, 1: 4}.get(compresslevel, 0)
+        header = b"\x1f\x8b\x08" + bytes([0x08 if fname else 0])
+        header += struct.pack("<L", mtime) + bytes([xfl, 255])
+        if fname:
+            header += fname + b"\0"
+        fileobj.write(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def tell(self):
+        return self._size
+
+    def write(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._buf += data
+        while len(self._buf) >= PARALLEL_BLOCK_SIZE:
+            self._submit(bytes(self._buf[:PARALLEL_BLOCK_SIZE]))
+            del self._buf[:PARALLEL_BLOCK_SIZE]
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(
+            self._executor.submit(
+                _deflate_block, block, self._zdict, self.compresslevel
+            )
+        )
+        self._zdict = block[-PARALLEL_DICT_SIZE:]
+        # bound the memory used by blocks waiting to be written out
+        while len(self._pending) > 2 * self._threads:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.fileobj is None:
+            return
+        try:
+            if self._buf:
+                self._submit(bytes(self._buf))
+                self._buf.clear()
+            while self._pending:
+                self.fileobj.write(self._pending.popleft().result())
+            # an empty final block ends the deflate stream
+            c = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self.fileobj.write(c.flush())
+            self.fileobj.write(struct.pack("<LL", self._crc, self._size & 0xFFFFFFFF))
+        finally:
+            self._executor.shutdown()
+            self.fileobj = None
+
+
+def create_tar_gz_from_files(
+    fp, files, filename=None, compresslevel=9, compression_threads=None
+):
     """Create a tar.gz file deterministically from files.
 
     This is a glorified wrapper around ``create_tar_from_files`` that
@@ -112,15 +216,28 @@ def create_tar_gz_from_files(fp, files, filename=None, compresslevel=9):
 
     The passed file handle should be opened for writing in binary mode.
     When the function returns, all data has been written to the handle.
+
+    If `compression_threads` is set, the archive is compressed with a
+    `ParallelGzipFile` using that many threads (or one per CPU for 0). The
+    output is then still deterministic, whatever the number of threads, but
+    differs from the output without `compression_threads`.
     """
-    # Offset 3-7 in the gzip header contains an mtime. Pin it to a known
-    # value so output is deterministic.
-    gf = gzip.GzipFile(
-        filename=filename or "",
-        mode="wb",
-        fileobj=fp,
-        compresslevel=compresslevel,
-        mtime=DEFAULT_MTIME,
-    )
+    if compression_threads is not None:
+        gf = ParallelGzipFile(
+            fp,
+            filename=filename or "",
+            compresslevel=compresslevel,
+            threads=compression_threads,
+        )
+    else:
+        # Offset 3-7 in the gzip header contains an mtime. Pin it to a known
+        # value so output is deterministic.
+        gf = gzip.GzipFile(
+            filename=filename or "",
+            mode="wb",
+            fileobj=fp,
+            compresslevel=compresslevel,
+            mtime=DEFAULT_MTIME,
+        )
     with gf:
         create_tar_from_files(gf, files)
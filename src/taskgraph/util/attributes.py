@@ -3,8 +3,13 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import functools
 import re
 
+# Characters with a special meaning in regular expressions. Keys without any
+# of them can only match a target exactly.
+_REGEX_CHARS = frozenset(".^$*+?{}[]\\|()")
+
 
 def attrmatch(attributes, **kwargs):
     """Determine whether the given set of task attributes matches.
@@ -41,6 +46,15 @@ def attrmatch(attributes, **kwargs):
     return True
 
 
+@functools.lru_cache(maxsize=None)
+def _key_pattern(key):
+    """Return the compiled regular expression for the `keymatch` key `key`,
+    or None if the key is a plain string which can only match exactly."""
+    if _REGEX_CHARS.isdisjoint(key):
+        return None
+    return re.compile(key + "$")
+
+
 def keymatch(attributes, target):
     """Determine if any keys in attributes are a match to target, then return
     a list of matching values. First exact matches will be checked. Failing
@@ -51,7 +65,11 @@ def keymatch(attributes, target):
         return [attributes[target]]
 
     # regular expression match
-    matches = [v for k, v in attributes.items() if re.match(k + "$", target)]
+    matches = []
+    for k, v in attributes.items():
+        pattern = _key_pattern(k)
+        if pattern is not None and pattern.match(target):
+            matches.append(v)
     if matches:
         return matches
 
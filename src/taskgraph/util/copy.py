@@ -1,9 +1,20 @@
+import copy
+import datetime
 from typing import Any
 
 from taskgraph.task import Task
 from taskgraph.util.readonlydict import ReadOnlyDict
 
-immutable_types = {int, float, bool, str, type(None), ReadOnlyDict}
+immutable_types = {
+    int,
+    float,
+    bool,
+    str,
+    type(None),
+    ReadOnlyDict,
+    datetime.date,
+    datetime.datetime,
+}
 
 
 def deepcopy(obj: Any) -> Any:
@@ -16,6 +27,8 @@ def deepcopy(obj: Any) -> Any:
     (such as Tasks).
     2. This special cases support for `taskgraph.task.Task` objects.
 
+    Objects of any other type are copied with `copy.deepcopy`.
+
     Args:
         obj: The object to deep copy.
 
@@ -29,6 +42,8 @@ def deepcopy(obj: Any) -> Any:
         return {k: deepcopy(v) for k, v in obj.items()}
     if ty is list:
         return [deepcopy(elt) for elt in obj]
+    if ty is tuple:
+        return tuple(deepcopy(elt) for elt in obj)
     if ty is Task:
         task = Task(
             kind=deepcopy(obj.kind),
@@ -44,4 +59,4 @@ def deepcopy(obj: Any) -> Any:
         if obj.task_id:
             task.task_id = obj.task_id
         return task
-    raise NotImplementedError(f"copying '{ty}' from '{obj}'")
+    return copy.deepcopy(obj)
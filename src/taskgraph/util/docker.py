@@ -8,9 +8,11 @@ import hashlib
 import io
 import os
 import re
+import stat
 from typing import Optional
 
 from taskgraph.util.archive import create_tar_gz_from_files
+from taskgraph.util.hash import hash_path
 
 IMAGE_DIR = os.path.join(".", "taskcluster", "docker")
 
@@ -64,9 +66,31 @@ class VoidWriter:
 
 
 def generate_context_hash(topsrcdir, image_path, args=None):
-    """Generates a sha256 hash for context directory used to build an image."""
+    """Generates a sha256 hash for context directory used to build an image.
 
-    return stream_context_tar(topsrcdir, image_path, VoidWriter(), args=args)
+    Rather than hashing the context tarball, which requires compressing the
+    whole context, this hashes the path, executable bit and (cached) hash of
+    each file that would go in it. The other permission bits depend on the
+    umask of the checkout, so they are left out. The result thus differs from
+    the hash returned by :func:`create_context_tar`.
+    """
+    h = hashlib.sha256()
+    archive_files = get_context_files(topsrcdir, image_path, args)
+    for archive_path, f in sorted(archive_files.items()):
+        if isinstance(f, str):
+            mode = "x" if os.stat(f).st_mode & stat.S_IXUSR else "-"
+            digest = hash_path(f)
+        else:
+            mode = "-"
+            if hasattr(f, "name"):
+                # files from the context directory are archived as opened
+                # files, with a default mode
+                digest = hash_path(f.name)
+                f.close()
+            else:
+                digest = hashlib.sha256(f.getvalue()).hexdigest()
+        h.update(f"{digest} {mode} {archive_path}\n".encode())
+    return h.hexdigest()
 
 
 class HashingWriter:
@@ -85,7 +109,9 @@ class HashingWriter:
         return self._hash.hexdigest()
 
 
-def create_context_tar(topsrcdir, context_dir, out_path, args=None):
+def create_context_tar(
+    topsrcdir, context_dir, out_path, args=None, compression_threads=None
+):
     """Create a context tarball.
 
     A directory ``context_dir`` containing a Dockerfile will be assembled into
@@ -105,6 +131,9 @@ def create_context_tar(topsrcdir, context_dir, out_path, args=None):
     found in the ``args`` argument. Exception: this doesn't apply to VOLUME
     definitions.
 
+    If ``compression_threads`` is set, the archive is compressed with that
+    many threads (see ``create_tar_gz_from_files``).
+
     Returns the SHA-256 hex digest of the created archive.
     """
     with open(out_path, "wb") as fh:
@@ -114,6 +143,7 @@ def create_context_tar(topsrcdir, context_dir, out_path, args=None):
             fh,
             image_name=os.path.basename(out_path),
             args=args,
+            compression_threads=compression_threads,
         )
 
 
@@ -135,9 +165,27 @@ RUN_TASK_SNIPPET = [
 ]
 
 
-def stream_context_tar(topsrcdir, context_dir, out_file, image_name=None, args=None):
+def stream_context_tar(
+    topsrcdir,
+    context_dir,
+    out_file,
+    image_name=None,
+    args=None,
+    compression_threads=None,
+):
     """Like create_context_tar, but streams the tar file to the `out_file` file
     object."""
+    archive_files = get_context_files(topsrcdir, context_dir, args)
+    writer = HashingWriter(out_file)
+    create_tar_gz_from_files(
+        writer, archive_files, image_name, compression_threads=compression_threads
+    )
+    return writer.hexdigest()
+
+
+def get_context_files(topsrcdir, context_dir, args=None):
+    """Return a map of the paths in the context archive of `context_dir` to
+    the files to put there, as expected by `create_tar_gz_from_files`."""
     archive_files = {}
     replace = []
     content = []
@@ -199,10 +247,7 @@ def stream_context_tar(topsrcdir, context_dir, out_file, image_name=None, args=N
                 archive_files[archive_path] = fs_path
 
     archive_files["Dockerfile"] = io.BytesIO("".join(content).encode("utf-8"))
-
-    writer = HashingWriter(out_file)
-    create_tar_gz_from_files(writer, archive_files, image_name)
-    return writer.hexdigest()
+    return archive_files
 
 
 @functools.lru_cache(maxsize=None)
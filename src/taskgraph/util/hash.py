@@ -4,10 +4,61 @@
 
 import functools
 import hashlib
-from pathlib import Path
+import os
+from concurrent import futures
 
 from taskgraph.util import path as mozpath
 
+# a `taskgraph.util.lookup_cache.LookupCache` remembering the hash of each file
+# by path, modification time and size across runs; set by `taskgraph` unless
+# `--no-hash-cache` is passed
+hash_cache = None
+
+# how long, in seconds, `taskgraph` keeps the hashes of files it hasn't seen
+# since
+HASH_CACHE_TTL = 30 * 24 * 60 * 60
+
+# files are read in chunks of this many bytes, rather than all at once
+CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(functools.partial(fh.read, CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_key(path):
+    st = os.stat(path)
+    return f"{path}\0{st.st_mtime_ns}\0{st.st_size}"
+
+
+def _hash_files(paths):
+    """Hash each of `paths`, reusing the hashes found in `hash_cache`, and
+    hashing the other files concurrently (hashlib releases the GIL while
+    hashing).
+
+    Returns the list of SHA-256 hashes in hex form.
+    """
+    digests = {}
+    if hash_cache is not None:
+        keys = {path: _cache_key(path) for path in paths}
+        cached = hash_cache.get_many("sha256", keys.values())
+        digests = {path: cached[key] for path, key in keys.items() if key in cached}
+
+    missing = [path for path in dict.fromkeys(paths) if path not in digests]
+    if len(missing) > 1:
+        with futures.ThreadPoolExecutor() as e:
+            digests.update(zip(missing, e.map(_hash_file, missing)))
+    elif missing:
+        digests[missing[0]] = _hash_file(missing[0])
+
+    if hash_cache is not None and missing:
+        hash_cache.put_many("sha256", [(keys[p], digests[p], None) for p in missing])
+    return [digests[path] for path in paths]
+
 
 @functools.lru_cache(maxsize=None)
 def hash_path(path):
@@ -15,8 +66,7 @@ def hash_path(path):
 
     Returns the SHA-256 hash in hex form.
     """
-    with open(path, "rb") as fh:
-        return hashlib.sha256(fh.read()).hexdigest()
+    return _hash_files([path])[0]
 
 
 def hash_paths(base_path, patterns):
@@ -30,30 +80,74 @@ def hash_paths(base_path, patterns):
     """
     h = hashlib.sha256()
 
-    found = set()
+    found, unmatched = _find_matching_files(base_path, tuple(patterns))
     for pattern in patterns:
-        matches = _find_matching_files(base_path, pattern)
-        if matches:
-            found.update(matches)
-        else:
+        if pattern in unmatched:
             raise Exception(f"{pattern} did not match anything")
-    for path in sorted(found):
-        h.update(
-            f"{hash_path(mozpath.abspath(mozpath.join(base_path, path)))} {mozpath.normsep(path)}\n".encode()
-        )
+    found = sorted(found)
+    digests = _hash_files(
+        [mozpath.abspath(mozpath.join(base_path, path)) for path in found]
+    )
+    for path, digest in zip(found, digests):
+        h.update(f"{digest} {mozpath.normsep(path)}\n".encode())
     return h.hexdigest()
 
 
+def _pattern_prefix(pattern):
+    """Return the leading part of `pattern` without wildcards. Only files
+    under that path can match `pattern`."""
+    parts = pattern.split("/")
+    for i, part in enumerate(parts):
+        if "*" in part:
+            parts = parts[:i]
+            break
+    return "/".join(parts).rstrip("/")
+
+
 @functools.lru_cache(maxsize=None)
-def _find_matching_files(base_path, pattern):
-    files = _get_all_files(base_path)
-    return [path for path in files if mozpath.match(path, pattern)]
+def _find_matching_files(base_path, patterns):
+    """Return the set of files under `base_path` matching any of `patterns`,
+    and the set of patterns matching no file."""
+    matcher = mozpath.PatternMatcher(patterns)
+
+    # only walk the outermost of the directories the patterns can match in
+    roots = []
+    for prefix in sorted({_pattern_prefix(p) for p in patterns}):
+        if not any(not r or prefix == r or prefix.startswith(r + "/") for r in roots):
+            roots.append(prefix)
+
+    found = set()
+    unmatched = set(matcher.patterns)
+    for root in roots:
+        for path in _get_all_files(base_path, root):
+            matches = matcher.matches(path)
+            if matches:
+                found.add(path)
+                unmatched -= matches
+    return frozenset(found), frozenset(unmatched)
 
 
 @functools.lru_cache(maxsize=None)
-def _get_all_files(base_path):
-    return [
-        mozpath.normsep(str(path))
-        for path in Path(base_path).rglob("*")
-        if path.is_file()
-    ]
+def _get_all_files(base_path, prefix=""):
+    """Return the paths, relative to `base_path`, of all the files under
+    `prefix`."""
+    top = os.path.join(base_path, prefix) if prefix else base_path
+    if os.path.isfile(top):
+        return [prefix]
+
+    files = []
+    stack = [(top, prefix)]
+    while stack:
+        path, relpath = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                name = f"{relpath}/{entry.name}" if relpath else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, name))
+                elif entry.is_file():
+                    files.append(name)
+    return files
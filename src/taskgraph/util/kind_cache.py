@@ -0,0 +1,195 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+A persistent, content-addressed cache of the tasks generated for each kind.
+
+Running the transforms for every kind is by far the most expensive part of
+generating the full task set, yet most of the time neither the kind
+definitions nor the transforms have changed since the previous run. This
+cache stores the tasks produced by :meth:`Kind.load_tasks
+<taskgraph.generator.Kind.load_tasks>`, keyed on a hash of everything that
+went into producing them:
+
+* the kind's configuration and every file in its directory (``kind.yml``,
+  ``tasks-from`` files, ...)
+* the source of every Python package providing the kind's loader or
+  transforms
+* the graph config and the parameters, except for the ones defaulting to the
+  current time (see :data:`VOLATILE_PARAMETERS`)
+* the upstream tasks from the kind's ``kind-dependencies``
+
+Files outside of these locations that a transform reads (e.g Docker contexts
+or toolchain resources) are not part of the key, so stale tasks are returned
+after editing them. The cache is therefore only used when explicitly enabled
+(``--kind-cache``).
+"""
+
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+
+import taskgraph
+from taskgraph.util import path as mozpath
+from taskgraph.util.hash import hash_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+"""Default maximum size of the cache, in bytes."""
+
+VOLATILE_PARAMETERS = ("build_date", "moz_build_date", "pushdate")
+"""Parameters left out of the cache keys.
+
+They default to the current time, so the cache would never be hit without a
+parameters file pinning them. Tasks embedding them are returned with the
+values of the run that cached them.
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_package(name):
+    """Hash the source files of the top-level package `name`."""
+    module = importlib.import_module(name)
+    paths = getattr(module, "__path__", None)
+    if not paths:
+        return hash_path(module.__file__)
+
+    h = hashlib.sha256()
+    for base in paths:
+        for path in sorted(Path(base).rglob("*.py")):
+            h.update(
+                f"{hash_path(str(path))} {mozpath.normsep(str(path.relative_to(base)))}\n".encode()
+            )
+    return h.hexdigest()
+
+
+def _hash_directory(base):
+    h = hashlib.sha256()
+    for path in sorted(Path(base).rglob("*")):
+        if path.is_file():
+            h.update(
+                f"{hash_path(str(path))} {mozpath.normsep(str(path.relative_to(base)))}\n".encode()
+            )
+    return h.hexdigest()
+
+
+def get_kind_packages(config):
+    """Return the names of the top-level Python packages providing the loader
+    and transforms of the kind with configuration `config`."""
+    modules = [config.get("loader", "taskgraph.loader.default:loader")]
+    modules.extend(config.get("transforms", []))
+    return {m.split(":")[0].split(".")[0] for m in modules}
+
+
+def _dumps(obj):
+    return json.dumps(obj, sort_keys=True, default=repr)
+
+
+class KindCache:
+    """An on-disk cache of the tasks generated by each kind.
+
+    Entries are evicted least recently used first, once the total size of the
+    cache exceeds `max_size` bytes.
+
+    Args:
+        path (str): Directory holding the cache entries.
+        max_size (int): Maximum size of the cache, in bytes.
+    """
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+    def parameters_key(self, parameters):
+        """Compute the part of the cache keys derived from `parameters`."""
+        parameters = {
+            k: v for k, v in parameters.items() if k not in VOLATILE_PARAMETERS
+        }
+        return hashlib.sha256(_dumps(parameters).encode("utf-8")).hexdigest()
+
+    def key(self, kind, parameters, loaded_tasks):
+        """Compute the cache key for the tasks of `kind`."""
+        config = kind.config
+        h = hashlib.sha256()
+        parts = [
+            taskgraph.__version__,
+            str(taskgraph.fast),
+            kind.name,
+            _dumps(config),
+            _hash_directory(kind.path) if os.path.isdir(kind.path) else "",
+            _dumps(kind.graph_config._config),
+            self.parameters_key(parameters),
+        ]
+        for package in sorted(get_kind_packages(config)):
+            parts.append(f"{package} {_hash_package(package)}")
+
+        kind_dependencies = config.get("kind-dependencies", [])
+        dependencies = sorted(
+            (t for t in loaded_tasks if t.kind in kind_dependencies),
+            key=lambda t: t.label,
+        )
+        parts.extend(_dumps(t.to_json()) for t in dependencies)
+
+        for part in parts:
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.path, f"{key}.pickle")
+
+    def get(self, key):
+        """Return the tasks cached under `key`, or None."""
+        entry = self._entry(key)
+        try:
+            with open(entry, "rb") as fh:
+                tasks = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable kind cache entry {entry}: {e}")
+            return None
+
+        # mark the entry as recently used
+        os.utime(entry)
+        return tasks
+
+    def put(self, key, tasks):
+        """Store `tasks` under `key`, evicting old entries if necessary."""
+        os.makedirs(self.path, exist_ok=True)
+        entry = self._entry(key)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as fh:
+                pickle.dump(tasks, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"Not caching tasks under {key}: {e}")
+            os.remove(tmp)
+            return
+        os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in
+        `max_size`."""
+        entries = []
+        for entry in Path(self.path).glob("*.pickle"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
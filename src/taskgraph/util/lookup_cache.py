@@ -0,0 +1,106 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+A persistent cache of the results of Taskcluster lookups.
+
+Generating the optimized graph looks up the same index paths and task
+statuses over and over, e.g when running ``taskgraph optimized`` repeatedly
+while developing, or for every file in a ``--parameters`` directory. Once
+enabled (see :mod:`taskgraph.util.taskcluster`), the results of these lookups
+are kept in a sqlite database for a configurable time to live, and never past
+the expiry of the task they refer to.
+
+The same kind of cache remembers the hashes of files between runs (see
+:mod:`taskgraph.util.hash`).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LookupCache:
+    """A sqlite backed cache of JSON-able lookup results.
+
+    Entries are grouped by `kind` (e.g ``"index"`` or ``"status"``) and expire
+    after `ttl` seconds, or earlier if they are stored with an explicit
+    expiry.
+
+    Args:
+        path (str): Path to the sqlite database.
+        ttl (int): Maximum number of seconds to keep an entry for.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def _db(self):
+        if self._conn is None:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS lookups ("
+                    "kind TEXT, key TEXT, value TEXT, expires REAL, "
+                    "PRIMARY KEY (kind, key))"
+                )
+                conn.execute("DELETE FROM lookups WHERE expires <= ?", (time.time(),))
+            self._conn = conn
+        return self._conn
+
+    def get(self, kind, key):
+        """Return the value cached for `key`, or None."""
+        return self.get_many(kind, [key]).get(key)
+
+    def get_many(self, kind, keys):
+        """Return a dictionary of the values cached for any of `keys`."""
+        values = {}
+        keys = list(keys)
+        now = time.time()
+        with self._lock:
+            # stay below sqlite's limit on the number of query parameters
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                rows = self._db.execute(
+                    "SELECT key, value FROM lookups WHERE kind = ? AND expires > ? "
+                    f"AND key IN ({', '.join('?' * len(chunk))})",
+                    (kind, now, *chunk),
+                )
+                values.update((key, json.loads(value)) for key, value in rows)
+        return values
+
+    def put(self, kind, key, value, expires=None):
+        """Cache `value` under `key`, until `expires` (in seconds since the
+        epoch) if that comes before the time to live runs out."""
+        self.put_many(kind, [(key, value, expires)])
+
+    def put_many(self, kind, entries):
+        """Cache each of the `(key, value, expires)` tuples in `entries`."""
+        deadline = time.time() + self.ttl
+        rows = [
+            (kind, key, json.dumps(value), min(deadline, expires or deadline))
+            for key, value, expires in entries
+        ]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                with self._db as conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?)", rows
+                    )
+            except sqlite3.Error as e:
+                logger.debug(f"Not caching {kind} lookups: {e}")
@@ -3,6 +3,8 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import copy
+import functools
 import re
 
 from taskgraph.util.taskcluster import get_artifact_url
@@ -34,20 +36,89 @@ def _recurse(val, param_fns):
     return recurse(val)
 
 
-def resolve_timestamps(now, task_def):
-    """Resolve all instances of `{'relative-datestamp': '..'}` in the given task definition"""
-    return _recurse(
-        task_def,
-        {
-            "relative-datestamp": lambda v: json_time_from_now(v, now),
-        },
-    )
+@functools.lru_cache(maxsize=1024)
+def _json_time_from_now(input_str, now):
+    return json_time_from_now(input_str, now)
 
 
-def resolve_task_references(label, task_def, task_id, decision_task_id, dependencies):
+def _find(val, param_keys):
+    """Return the paths (as tuples of keys and list indices) of the values
+    that `_recurse` would pass to the functions for `param_keys`."""
+    paths = []
+
+    def find(val, path):
+        if isinstance(val, list):
+            for i, v in enumerate(val):
+                find(v, path + (i,))
+        elif isinstance(val, dict):
+            if len(val) == 1 and next(iter(val)) in param_keys:
+                paths.append(path)
+                return
+            for k, v in val.items():
+                find(v, path + (k,))
+
+    find(val, ())
+    return paths
+
+
+def _recurse_paths(val, paths, param_fns):
+    """Like `_recurse`, but only for the values at `paths` (as returned by
+    `_find`). `val` and the containers along these paths are copied, the rest
+    is shared with `val`."""
+    copied = {(0,)}
+    root = [copy.copy(val)]
+    for path in paths:
+        path = (0,) + tuple(path)
+        parent = root
+        for i, key in enumerate(path[:-1]):
+            if path[: i + 1] not in copied:
+                parent[key] = copy.copy(parent[key])
+                copied.add(path[: i + 1])
+            parent = parent[key]
+        parent[path[-1]] = _recurse(parent[path[-1]], param_fns)
+    return root[0]
+
+
+def find_timestamps(task_def):
+    """Return the paths (as tuples of keys and list indices) of all instances
+    of `{'relative-datestamp': '..'}` in the given task definition, for
+    `resolve_timestamps`."""
+    return _find(task_def, {"relative-datestamp"})
+
+
+def resolve_timestamps(now, task_def, paths=None):
+    """Resolve all instances of `{'relative-datestamp': '..'}` in the given task definition
+
+    If `paths` (as returned by `find_timestamps`) is given, only the values at
+    these paths are resolved, without walking the rest of the task
+    definition. `task_def` and the containers along these paths are copied,
+    the rest is shared with `task_def`.
+    """
+    param_fns = {
+        "relative-datestamp": lambda v: _json_time_from_now(v, now),
+    }
+    if paths is None:
+        return _recurse(task_def, param_fns)
+    return _recurse_paths(task_def, paths, param_fns)
+
+
+def find_task_references(task_def):
+    """Return the paths (as tuples of keys and list indices) of all instances
+    of ``{'task-reference': '..'}`` and ``{'artifact-reference': '..'}`` in
+    the given task definition, for `resolve_task_references`."""
+    return _find(task_def, {"task-reference", "artifact-reference"})
+
+
+def resolve_task_references(
+    label, task_def, task_id, decision_task_id, dependencies, paths=None
+):
     """Resolve all instances of ``{'task-reference': '..<..>..'} ``
     and ``{'artifact-reference`: '..<dependency/artifact/path>..'}``
     in the given task definition, using the given dependencies.
+
+    If `paths` (as returned by `find_task_references`) is given, only the
+    values at these paths are resolved, and only `task_def` and the containers
+    along these paths are copied, as with `resolve_timestamps`.
     """
 
     def task_reference(val):
@@ -91,10 +162,10 @@ def resolve_task_references(label, task_def, task_id, decision_task_id, dependen
 
         return ARTIFACT_REFERENCE_PATTERN.sub(repl, val)
 
-    return _recurse(
-        task_def,
-        {
-            "task-reference": task_reference,
-            "artifact-reference": artifact_reference,
-        },
-    )
+    param_fns = {
+        "task-reference": task_reference,
+        "artifact-reference": artifact_reference,
+    }
+    if paths is None:
+        return _recurse(task_def, param_fns)
+    return _recurse_paths(task_def, paths, param_fns)
@@ -130,6 +130,97 @@ def match(path, pattern):
     return re_cache[pattern].match(path) is not None
 
 
+class _PatternNode:
+    __slots__ = ("literals", "wildcards", "globstar", "patterns")
+
+    def __init__(self):
+        self.literals = {}
+        self.wildcards = {}
+        self.globstar = None
+        self.patterns = []
+
+
+class PatternMatcher:
+    """
+    Match paths against many patterns at once, with the same semantics as
+    :py:func:`match`.
+
+    The patterns are merged into a trie of their path components, so that
+    matching a path only visits the patterns sharing its leading directories
+    (or starting with wildcards), rather than testing every pattern in turn.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = set(patterns)
+        self._root = _PatternNode()
+        # patterns the trie can't represent, which are tested one at a time
+        self._fallback = []
+        for pattern in self.patterns:
+            self._add(pattern)
+
+    def _add(self, pattern):
+        if not pattern:
+            self._root.patterns.append(pattern)
+            return
+        parts = pattern.split("/")
+        # `match` treats a `**` following another `**` as a single component
+        # wildcard, which the trie doesn't bother with
+        if "" in parts or "**/**" in pattern:
+            self._fallback.append(pattern)
+            return
+
+        node = self._root
+        for part in parts:
+            if part == "**":
+                if node.globstar is None:
+                    node.globstar = _PatternNode()
+                node = node.globstar
+            elif "*" in part:
+                if part not in node.wildcards:
+                    regex = re.compile(re.escape(part).replace(r"\*", "[^/]*"))
+                    node.wildcards[part] = (regex, _PatternNode())
+                node = node.wildcards[part][1]
+            else:
+                node = node.literals.setdefault(part, _PatternNode())
+        node.patterns.append(pattern)
+
+    def matches(self, path):
+        """Return the set of patterns matching `path`."""
+        parts = path.split("/")
+        found = {p for p in self._fallback if match(path, p)}
+        seen = set()
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if (id(node), i) in seen:
+                continue
+            seen.add((id(node), i))
+
+            # a pattern matching one of the ancestor directories of a path
+            # matches the path
+            found.update(node.patterns)
+            if node.globstar is not None:
+                stack.extend((node.globstar, j) for j in range(i, len(parts) + 1))
+            if i == len(parts):
+                continue
+            part = parts[i]
+            if part in node.literals:
+                stack.append((node.literals[part], i + 1))
+            for regex, child in node.wildcards.values():
+                if regex.fullmatch(part):
+                    stack.append((child, i + 1))
+        return found
+
+    def match_any(self, paths):
+        """Return the set of patterns matching at least one of `paths`."""
+        found = set()
+        for path in paths:
+            found |= self.matches(path)
+            if len(found) == len(self.patterns):
+                break
+        return found
+
+
 def rebase(oldbase, base, relativepath):
     """
     Return `relativepath` relative to `base` instead of `oldbase`.
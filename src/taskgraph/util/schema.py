@@ -45,8 +45,10 @@ def optionally_keyed_by(*arguments):
     """
     schema = arguments[-1]
     fields = arguments[:-1]
+    compiled = None
 
     def validator(obj):
+        nonlocal compiled
         if isinstance(obj, dict) and len(obj) == 1:
             k, v = list(obj.items())[0]
             if k.startswith("by-") and k[len("by-") :] in fields:
@@ -58,7 +60,10 @@ def optionally_keyed_by(*arguments):
                         e.prepend([k, kk])
                         raise
                 return res
-        return Schema(schema)(obj)
+        if compiled is None:
+            # compile the schema on first use rather than on every call
+            compiled = Schema(schema)
+        return compiled(obj)
 
     return validator
 
@@ -143,7 +148,7 @@ def resolve_keyed_by(
         item_name=f"`{field}` in `{item_name}`",
         defer=defer,
         enforce_single_match=enforce_single_match,
-        attributes=dict(item, **extra_values),
+        attributes=collections.ChainMap(extra_values, item) if extra_values else item,
     )
 
     return item
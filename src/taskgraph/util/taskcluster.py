@@ -3,11 +3,15 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import collections
 import copy
 import datetime
 import functools
 import logging
 import os
+import threading
+import time
+from concurrent import futures
 from typing import Dict, List, Union
 
 import requests
@@ -22,6 +26,11 @@ logger = logging.getLogger(__name__)
 # this is set to true for `mach taskgraph action-callback --test`
 testing = False
 
+# a `taskgraph.util.lookup_cache.LookupCache` persisting the results of index,
+# status and task definition lookups across runs; set by `taskgraph
+# --lookup-cache-ttl`
+lookup_cache = None
+
 # Default rootUrl to use if none is given in the environment; this should point
 # to the production Taskcluster deployment used for CI.
 PRODUCTION_TASKCLUSTER_ROOT_URL = None
@@ -29,6 +38,10 @@ PRODUCTION_TASKCLUSTER_ROOT_URL = None
 # the maximum number of parallel Taskcluster API calls to make
 CONCURRENCY = 50
 
+# the maximum number of index paths or task ids to look up in a single batched
+# Taskcluster API call
+BATCH_SIZE = 1000
+
 
 @functools.lru_cache(maxsize=None)
 def get_root_url(use_proxy):
@@ -148,28 +161,34 @@ def _handle_artifact(path, response):
     return response.raw
 
 
-def get_artifact_url(task_id, path, use_proxy=False):
+def get_artifact_url(task_id, path, use_proxy=False, run_id=None):
+    if run_id is None:
+        artifact_tmpl = liburls.api(
+            get_root_url(use_proxy), "queue", "v1", "task/{}/artifacts/{}"
+        )
+        return artifact_tmpl.format(task_id, path)
     artifact_tmpl = liburls.api(
-        get_root_url(use_proxy), "queue", "v1", "task/{}/artifacts/{}"
+        get_root_url(use_proxy), "queue", "v1", "task/{}/runs/{}/artifacts/{}"
     )
-    return artifact_tmpl.format(task_id, path)
+    return artifact_tmpl.format(task_id, run_id, path)
 
 
-def get_artifact(task_id, path, use_proxy=False):
+def get_artifact(task_id, path, use_proxy=False, run_id=None):
     """
-    Returns the artifact with the given path for the given task id.
+    Returns the artifact with the given path for the given task id, from the
+    given run, or the latest one if `run_id` is None.
 
     If the path ends with ".json" or ".yml", the content is deserialized as,
     respectively, json or yaml, and the corresponding python data (usually
     dict) is returned.
     For other types of content, a file-like object is returned.
     """
-    response = _do_request(get_artifact_url(task_id, path, use_proxy))
+    response = _do_request(get_artifact_url(task_id, path, use_proxy, run_id))
     return _handle_artifact(path, response)
 
 
-def list_artifacts(task_id, use_proxy=False):
-    response = _do_request(get_artifact_url(task_id, "", use_proxy).rstrip("/"))
+def list_artifacts(task_id, use_proxy=False, run_id=None):
+    response = _do_request(get_artifact_url(task_id, "", use_proxy, run_id).rstrip("/"))
     return response.json()["artifacts"]
 
 
@@ -193,30 +212,158 @@ def get_index_url(index_path, use_proxy=False, multiple=False):
     return index_tmpl.format("s" if multiple else "", index_path)
 
 
-def find_task_id(index_path, use_proxy=False):
+# task states that will not change anymore, so are safe to cache
+RESOLVED_STATES = {"completed", "failed", "exception"}
+
+
+def _timestamp(value):
+    """Return the "expires" field of `value` in seconds since the epoch, if
+    any."""
+    if not value.get("expires"):
+        return None
+    expires = parse_time(value["expires"]).replace(tzinfo=datetime.timezone.utc)
+    return expires.timestamp()
+
+
+def _cached(kind, keys, fetch, use_proxy, expires=_timestamp):
+    """Return a dictionary of the values of `keys`, taking them from
+    `lookup_cache` when possible, and calling `fetch` with the list of missing
+    keys otherwise.
+
+    Fetched values are cached until the timestamp returned by `expires` (or
+    the cache's time to live), unless it returns False.
+    """
+    if lookup_cache is None:
+        return fetch(keys)
+
+    # the same index paths and task ids may refer to different things on
+    # different deployments
+    prefix = f"{get_root_url(use_proxy)} "
+    cached = lookup_cache.get_many(kind, [prefix + key for key in keys])
+    results = {key[len(prefix) :]: value for key, value in cached.items()}
+    missing = [key for key in keys if key not in results]
+    if missing:
+        fetched = fetch(missing)
+        entries = []
+        for key, value in fetched.items():
+            expiry = expires(value)
+            if expiry is not False:
+                entries.append((prefix + key, value, expiry))
+        lookup_cache.put_many(kind, entries)
+        results.update(fetched)
+    return results
+
+
+def _find_task_id(index_path, use_proxy):
     try:
         response = _do_request(get_index_url(index_path, use_proxy))
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 404:  # type: ignore
             raise KeyError(f"index path {index_path} not found")
         raise
-    return response.json()["taskId"]
+    return response.json()
 
 
-def find_task_id_batched(index_paths, use_proxy=False):
-    """Gets the task id of multiple tasks given their respective index.
+def find_task_id(index_path, use_proxy=False):
+    entry = _cached(
+        "index",
+        [index_path],
+        lambda paths: {index_path: _find_task_id(index_path, use_proxy)},
+        use_proxy,
+    )[index_path]
+    return entry["taskId"]
+
+
+class _AdaptiveLimit:
+    """Limit the number of concurrent requests, additively increasing the limit
+    after each successful request and halving it whenever the server asks us
+    to slow down (HTTP 429)."""
+
+    def __init__(self, maximum, initial=4):
+        self.maximum = maximum
+        self.limit = min(initial, maximum)
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1)
+            self._cond.notify_all()
 
-    Args:
-        index_paths (List[str]): A list of task indexes.
-        use_proxy (bool): Whether to use taskcluster-proxy (default: False)
 
-    Returns:
-        Dict[str, str]: A dictionary object mapping each valid index path
-                        to its respective task id.
+class _LatencyHistogram:
+    """Count request latencies in power-of-two millisecond buckets."""
 
-    See the endpoint here:
-        https://docs.taskcluster.net/docs/reference/core/index/api#findTasksAtIndex
+    def __init__(self):
+        self.buckets = collections.Counter()
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        bucket = 1
+        while bucket < seconds * 1000:
+            bucket *= 2
+        with self._lock:
+            self.buckets[bucket] += 1
+
+    def __str__(self):
+        return ", ".join(
+            f"<={bucket}ms: {count}" for bucket, count in sorted(self.buckets.items())
+        )
+
+
+def _fetch_batched(fetch, items, description):
+    """Call `fetch` on chunks of at most `BATCH_SIZE` of `items`, concurrently
+    if there is more than one, and merge the resulting dictionaries.
+
+    Chunks that get throttled (HTTP 429) are retried after a backoff, with
+    fewer requests in flight.
     """
+    chunks = [items[i : i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    if len(chunks) <= 1:
+        return fetch(items)
+
+    limit = _AdaptiveLimit(CONCURRENCY)
+    histogram = _LatencyHistogram()
+
+    def fetch_chunk(chunk):
+        for attempt in range(1, 6):
+            limit.acquire()
+            throttled = False
+            start = time.monotonic()
+            try:
+                result = fetch(chunk)
+                histogram.add(time.monotonic() - start)
+                return result
+            except requests.exceptions.HTTPError as e:
+                throttled = e.response is not None and e.response.status_code == 429
+                if not throttled or attempt == 5:
+                    raise
+            finally:
+                limit.release(throttled=throttled)
+            time.sleep(0.5 * 2**attempt)
+
+    results = {}
+    with futures.ThreadPoolExecutor(min(CONCURRENCY, len(chunks))) as e:
+        for result in e.map(fetch_chunk, chunks):
+            results.update(result)
+    logger.debug(
+        f"Fetched {description} of {len(items)} items in {len(chunks)} requests "
+        f"({histogram})"
+    )
+    return results
+
+
+def _find_task_ids(index_paths, use_proxy):
     endpoint = liburls.api(get_root_url(use_proxy), "index", "v1", "tasks/indexes")
     task_ids = {}
     continuation_token = None
@@ -238,14 +385,42 @@ def find_task_id_batched(index_paths, use_proxy=False):
         if (len(task_ids) + len(response_tasks)) > len(index_paths):
             # Sanity check
             raise ValueError("more task ids were returned than were asked for")
-        task_ids.update((t["namespace"], t["taskId"]) for t in response_tasks)
+        task_ids.update((t["namespace"], t) for t in response_tasks)
 
-        continuationToken = response_data.get("continuationToken")
-        if continuationToken is None:
+        continuation_token = response_data.get("continuationToken")
+        if continuation_token is None:
             break
     return task_ids
 
 
+def find_task_id_batched(index_paths, use_proxy=False):
+    """Gets the task id of multiple tasks given their respective index.
+
+    Index paths are looked up in chunks of `BATCH_SIZE`, which are requested
+    concurrently.
+
+    Args:
+        index_paths (List[str]): A list of task indexes.
+        use_proxy (bool): Whether to use taskcluster-proxy (default: False)
+
+    Returns:
+        Dict[str, str]: A dictionary object mapping each valid index path
+                        to its respective task id.
+
+    See the endpoint here:
+        https://docs.taskcluster.net/docs/reference/core/index/api#findTasksAtIndex
+    """
+    entries = _cached(
+        "index",
+        list(index_paths),
+        lambda paths: _fetch_batched(
+            functools.partial(_find_task_ids, use_proxy=use_proxy), paths, "task ids"
+        ),
+        use_proxy,
+    )
+    return {path: entry["taskId"] for path, entry in entries.items()}
+
+
 def get_artifact_from_index(index_path, artifact_path, use_proxy=False):
     full_path = index_path + "/artifacts/" + artifact_path
     response = _do_request(get_index_url(full_path, use_proxy))
@@ -257,6 +432,16 @@ def list_tasks(index_path, use_proxy=False):
     Returns a list of task_ids where each task_id is indexed under a path
     in the index. Results are sorted by expiration date from oldest to newest.
     """
+    return _cached(
+        "list",
+        [index_path],
+        lambda paths: {index_path: _list_tasks(index_path, use_proxy)},
+        use_proxy,
+        expires=lambda task_ids: None,
+    )[index_path]
+
+
+def _list_tasks(index_path, use_proxy):
     results = []
     data = {}
     while True:
@@ -290,8 +475,20 @@ def get_task_url(task_id, use_proxy=False):
 
 @functools.lru_cache(maxsize=None)
 def get_task_definition(task_id, use_proxy=False):
-    response = _do_request(get_task_url(task_id, use_proxy))
-    return response.json()
+    return _cached(
+        "definition",
+        [task_id],
+        lambda task_ids: {
+            task_id: _do_request(get_task_url(task_id, use_proxy)).json()
+        },
+        use_proxy,
+    )[task_id]
+
+
+def _resolved_expiry(status):
+    if status.get("state") not in RESOLVED_STATES:
+        return False
+    return _timestamp(status)
 
 
 def cancel_task(task_id, use_proxy=False):
@@ -319,27 +516,20 @@ def status_task(task_id, use_proxy=False):
     if testing:
         logger.info(f"Would have gotten status for {task_id}.")
     else:
-        resp = _do_request(get_task_url(task_id, use_proxy) + "/status")
-        status = resp.json().get("status", {})
-        return status
-
-
-def status_task_batched(task_ids, use_proxy=False):
-    """Gets the status of multiple tasks given task_ids.
+        return _cached(
+            "status",
+            [task_id],
+            lambda task_ids: {
+                task_id: _do_request(get_task_url(task_id, use_proxy) + "/status")
+                .json()
+                .get("status", {})
+            },
+            use_proxy,
+            expires=_resolved_expiry,
+        )[task_id]
 
-    In testing mode, just logs that it would have retrieved statuses.
 
-    Args:
-        task_id (List[str]): A list of task ids.
-        use_proxy (bool): Whether to use taskcluster-proxy (default: False)
-
-    Returns:
-        dict: A dictionary object as defined here:
-          https://docs.taskcluster.net/docs/reference/platform/queue/api#statuses
-    """
-    if testing:
-        logger.info(f"Would have gotten status for {len(task_ids)} tasks.")
-        return
+def _status_tasks(task_ids, use_proxy):
     endpoint = liburls.api(get_root_url(use_proxy), "queue", "v1", "tasks/status")
     statuses = {}
     continuation_token = None
@@ -362,12 +552,42 @@ def status_task_batched(task_ids, use_proxy=False):
         if (len(statuses) + len(response_tasks)) > len(task_ids):
             raise ValueError("more task statuses were returned than were asked for")
         statuses.update((t["taskId"], t["status"]) for t in response_tasks)
-        continuationToken = response_data.get("continuationToken")
-        if continuationToken is None:
+        continuation_token = response_data.get("continuationToken")
+        if continuation_token is None:
             break
     return statuses
 
 
+def status_task_batched(task_ids, use_proxy=False):
+    """Gets the status of multiple tasks given task_ids.
+
+    In testing mode, just logs that it would have retrieved statuses. Task ids
+    are looked up in chunks of `BATCH_SIZE`, which are requested concurrently.
+
+    Args:
+        task_id (List[str]): A list of task ids.
+        use_proxy (bool): Whether to use taskcluster-proxy (default: False)
+
+    Returns:
+        dict: A dictionary object as defined here:
+          https://docs.taskcluster.net/docs/reference/platform/queue/api#statuses
+    """
+    if testing:
+        logger.info(f"Would have gotten status for {len(task_ids)} tasks.")
+        return
+    return _cached(
+        "status",
+        list(task_ids),
+        lambda task_ids: _fetch_batched(
+            functools.partial(_status_tasks, use_proxy=use_proxy),
+            task_ids,
+            "task statuses",
+        ),
+        use_proxy,
+        expires=_resolved_expiry,
+    )
+
+
 def state_task(task_id, use_proxy=False):
     """Gets the state of a task given a task_id.
 
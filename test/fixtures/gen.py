@@ -37,6 +37,8 @@ def fake_loader(kind, path, config, parameters, loaded_tasks):
         }
         if "task-defaults" in config:
             task = merge(config["task-defaults"], task)
+        if config.get("record-loaded-tasks"):
+            task["attributes"]["loaded_tasks"] = [t.label for t in loaded_tasks]
         yield task
 
 
@@ -160,7 +162,7 @@ def parameters():
 
 @pytest.fixture
 def maketgg(monkeypatch, parameters):
-    def inner(target_tasks=None, kinds=[("_fake", [])], params=None):
+    def inner(target_tasks=None, kinds=[("_fake", [])], params=None, **kwargs):
         params = params or {}
         FakeKind.loaded_kinds = []
         target_tasks = target_tasks or []
@@ -180,7 +182,7 @@ def maketgg(monkeypatch, parameters):
 
         monkeypatch.setattr(generator, "load_graph_config", fake_load_graph_config)
 
-        return WithFakeKind("/root", parameters)
+        return WithFakeKind("/root", parameters, **kwargs)
 
     return inner
 
@@ -0,0 +1,54 @@
+# Any copyright is dedicated to the public domain.
+# http://creativecommons.org/publicdomain/zero/1.0/
+
+import pytest
+import zstandard as zstd
+
+from taskgraph.actions.util import fetch_full_task_graph
+from taskgraph.util.taskcluster import get_root_url
+
+FULL_TASK_GRAPH = {"a": {"label": "a", "dependencies": {}}}
+
+
+@pytest.fixture
+def artifacts_url(responses):
+    get_root_url.cache_clear()
+    return f"{get_root_url(False)}/api/queue/v1/task/abc/artifacts/public"
+
+
+def test_fetch_full_task_graph_json(responses, artifacts_url, graph_config):
+    responses.add(
+        responses.GET,
+        f"{artifacts_url}/full-task-graph.json",
+        json=FULL_TASK_GRAPH,
+    )
+    assert fetch_full_task_graph("abc", graph_config) == FULL_TASK_GRAPH
+
+
+def test_fetch_full_task_graph_formats(
+    monkeypatch, responses, artifacts_url, graph_config
+):
+    msgpack = pytest.importorskip("msgpack")
+    monkeypatch.setitem(
+        graph_config["taskgraph"],
+        "task-graph-artifact-formats",
+        ["msgpack.zst", "json.zst"],
+    )
+
+    # fall back to the next format if an artifact is missing
+    responses.add(
+        responses.GET, f"{artifacts_url}/full-task-graph.msgpack.zst", status=404
+    )
+    responses.add(
+        responses.GET,
+        f"{artifacts_url}/full-task-graph.json.zst",
+        body=zstd.ZstdCompressor().compress(b'{"a": {"label": "a"}}'),
+    )
+    assert fetch_full_task_graph("abc", graph_config) == {"a": {"label": "a"}}
+
+    responses.replace(
+        responses.GET,
+        f"{artifacts_url}/full-task-graph.msgpack.zst",
+        body=zstd.ZstdCompressor().compress(msgpack.packb(FULL_TASK_GRAPH)),
+    )
+    assert fetch_full_task_graph("abc", graph_config) == FULL_TASK_GRAPH
@@ -3,6 +3,10 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import asyncio
+import os
+import tempfile
+import threading
 import unittest
 from unittest import mock
 
@@ -12,9 +16,59 @@ from taskgraph.graph import Graph
 from taskgraph.task import Task
 from taskgraph.taskgraph import TaskGraph
 
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
 GRAPH_CONFIG = GraphConfig({"trust-domain": "domain"}, "/var/empty")
 
 
+class MockQueue:
+    """A local stand-in for the queue's createTask endpoint, recording the
+    order in which tasks get created. The first request for each task in
+    `flaky` fails with a server error, and tasks in `existing` conflict with
+    tasks that already exist."""
+
+    def __init__(self, flaky=(), existing=()):
+        self.created = []
+        self.flaky = set(flaky)
+        self.existing = set(existing)
+        self.loop = asyncio.new_event_loop()
+
+    async def create_task(self, request):
+        task_id = request.match_info["task_id"]
+        task_def = await request.json()
+        if task_id in self.flaky:
+            self.flaky.remove(task_id)
+            return web.json_response({"message": "try again"}, status=503)
+        if task_id in self.existing:
+            return web.json_response({"message": "task exists"}, status=409)
+        missing = set(task_def["dependencies"]) - set(self.created) - {"decisiontask"}
+        if missing:
+            return web.json_response({"message": f"missing {missing}"}, status=400)
+        self.created.append(task_id)
+        return web.json_response({"status": {"taskId": task_id}})
+
+    def __enter__(self):
+        app = web.Application()
+        app.router.add_put("/task/{task_id}", self.create_task)
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *args):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.run_until_complete(self.runner.cleanup())
+        self.loop.close()
+
+
 class TestCreate(unittest.TestCase):
     def setUp(self):
         self.created_tasks = {}
@@ -24,7 +78,7 @@ class TestCreate(unittest.TestCase):
     def tearDown(self):
         create.create_task = self.old_create_task
 
-    def fake_create_task(self, session, task_id, label, task_def):
+    def fake_create_task(self, session, task_id, label, task_def, **kwargs):
         self.created_tasks[task_id] = task_def
 
     def test_create_tasks(self):
@@ -92,7 +146,7 @@ class TestCreate(unittest.TestCase):
         graph = Graph(nodes={"tid-a"}, edges=set())
         taskgraph = TaskGraph(tasks, graph)
 
-        def fail(*args):
+        def fail(*args, **kwargs):
             print("UHOH")
             raise RuntimeError("oh no!")
 
@@ -106,3 +160,232 @@ class TestCreate(unittest.TestCase):
                 {"level": "4"},
                 decision_task_id="decisiontask",
             )
+
+    def test_create_tasks_deep_graph(self):
+        "tasks are created after their dependencies, however deep the graph"
+        count = 3000
+        tasks = {}
+        edges = set()
+        for i in range(count):
+            task_def = {"payload": "hello world"}
+            if i:
+                task_def["dependencies"] = [f"tid-{i - 1}"]
+                edges.add((f"tid-{i}", f"tid-{i - 1}", "prev"))
+            tasks[f"tid-{i}"] = Task(
+                kind="test", label=f"t-{i}", attributes={}, task=task_def
+            )
+        taskgraph = TaskGraph(tasks, Graph(set(tasks), edges))
+
+        create.create_tasks(
+            GRAPH_CONFIG,
+            taskgraph,
+            {t.label: tid for tid, t in tasks.items()},
+            {"level": "4"},
+            decision_task_id="decisiontask",
+            concurrency=4,
+        )
+        self.assertEqual(list(self.created_tasks), [f"tid-{i}" for i in range(count)])
+
+    @mock.patch("taskgraph.create.time")
+    def test_rate_limiter(self, time):
+        time.monotonic.return_value = 10.0
+        limiter = create._RateLimiter(4)
+        for _ in range(3):
+            limiter.wait()
+        self.assertEqual([c.args[0] for c in time.sleep.call_args_list], [0.25, 0.5])
+
+        time.reset_mock()
+        limiter = create._RateLimiter(None)
+        limiter.wait()
+        limiter.wait()
+        time.sleep.assert_not_called()
+
+    @unittest.skipIf(web is None, "aiohttp is not installed")
+    def test_create_tasks_asyncio(self):
+        "the asyncio backend creates dependencies before their dependents"
+        create.create_task = self.old_create_task
+        tasks = {}
+        edges = set()
+        for i in range(50):
+            task_def = {"payload": "hello world"}
+            # a handful of independent chains
+            if i >= 5:
+                task_def["dependencies"] = [f"tid-{i - 5}"]
+                edges.add((f"tid-{i}", f"tid-{i - 5}", "prev"))
+            tasks[f"tid-{i}"] = Task(
+                kind="test", label=f"t-{i}", attributes={}, task=task_def
+            )
+        tasks["tid-0"].attributes["task_duplicates"] = 2
+        taskgraph = TaskGraph(tasks, Graph(set(tasks), edges))
+
+        queue = MockQueue(flaky=["tid-3", "tid-30"])
+        with queue as url, mock.patch.object(create, "QUEUE_URL", url):
+            create.create_tasks(
+                GRAPH_CONFIG,
+                taskgraph,
+                {t.label: tid for tid, t in tasks.items()},
+                {"level": "4"},
+                decision_task_id="decisiontask",
+                concurrency=8,
+                backend="asyncio",
+            )
+
+        # every task (and the duplicate) was created once, retrying the
+        # flaky ones
+        self.assertEqual(len(queue.created), 51)
+        self.assertLessEqual(set(tasks), set(queue.created))
+        for i in range(5, 50):
+            self.assertLess(
+                queue.created.index(f"tid-{i - 5}"), queue.created.index(f"tid-{i}")
+            )
+
+    def test_create_tasks_journal(self):
+        "tasks recorded in the journal by a previous run are not created again"
+        tasks = {}
+        edges = set()
+        for i in range(4):
+            task_def = {"payload": "hello world"}
+            if i:
+                task_def["dependencies"] = [f"tid-{i - 1}"]
+                edges.add((f"tid-{i}", f"tid-{i - 1}", "prev"))
+            tasks[f"tid-{i}"] = Task(
+                kind="test", label=f"t-{i}", attributes={}, task=task_def
+            )
+        label_to_taskid = {t.label: tid for tid, t in tasks.items()}
+
+        def fail_on_tid_2(session, task_id, label, task_def, **kwargs):
+            if task_id == "tid-2":
+                raise RuntimeError("oh no!")
+            self.fake_create_task(session, task_id, label, task_def)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal = os.path.join(tmpdir, "journal.txt")
+            for create_task, decision_task_id in (
+                (fail_on_tid_2, "decisiontask"),
+                (self.fake_create_task, "decisiontask"),
+            ):
+                with mock.patch.object(create, "create_task", create_task):
+                    try:
+                        create.create_tasks(
+                            GRAPH_CONFIG,
+                            TaskGraph(tasks, Graph(set(tasks), edges)),
+                            label_to_taskid,
+                            {"level": "4"},
+                            decision_task_id=decision_task_id,
+                            journal=journal,
+                        )
+                    except RuntimeError:
+                        self.assertEqual(list(self.created_tasks), ["tid-0", "tid-1"])
+                        self.created_tasks.clear()
+
+            self.assertEqual(list(self.created_tasks), ["tid-2", "tid-3"])
+            self.assertEqual(
+                create.read_journal(journal, "decisiontask"),
+                {"tid-0", "tid-1", "tid-2", "tid-3"},
+            )
+            # journals of other decision tasks are ignored
+            self.assertIsNone(create.read_journal(journal, "otherdecision"))
+
+    @mock.patch("taskgraph.create.get_session")
+    def test_create_tasks_resolves_timestamps(self, get_session):
+        "relative datestamps are resolved against a time shared by the tasks"
+        create.create_task = self.old_create_task
+        session = get_session.return_value
+        session.put.return_value.status_code = 200
+        tasks = {
+            f"tid-{i}": Task(
+                kind="test",
+                label=f"t-{i}",
+                attributes={},
+                task={"deadline": {"relative-datestamp": "1 day"}, "payload": {}},
+            )
+            for i in range(3)
+        }
+        taskgraph = TaskGraph(tasks, Graph(set(tasks), set()))
+
+        create.create_tasks(
+            GRAPH_CONFIG,
+            taskgraph,
+            {t.label: tid for tid, t in tasks.items()},
+            {"level": "4"},
+            decision_task_id="decisiontask",
+        )
+
+        deadlines = {c.kwargs["json"]["deadline"] for c in session.put.call_args_list}
+        self.assertEqual(len(session.put.call_args_list), 3)
+        self.assertEqual(len(deadlines), 1)
+        self.assertTrue(deadlines.pop().endswith("Z"))
+        # the task definitions in the graph are left alone
+        for task in tasks.values():
+            self.assertEqual(task.task["deadline"], {"relative-datestamp": "1 day"})
+
+    @mock.patch("taskgraph.create.get_session")
+    def test_create_tasks_resume_existing(self, get_session):
+        "tasks that already exist are considered created when resuming"
+        create.create_task = self.old_create_task
+        session = get_session.return_value
+
+        def put(url, json):
+            response = mock.Mock(status_code=200)
+            if url.endswith("/tid-1"):
+                response.status_code = 409
+                response.raise_for_status.side_effect = RuntimeError("conflict")
+            return response
+
+        session.put.side_effect = put
+        tasks = {
+            f"tid-{i}": Task(kind="test", label=f"t-{i}", attributes={}, task={})
+            for i in range(3)
+        }
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal = os.path.join(tmpdir, "journal.txt")
+            kwargs = {"decision_task_id": "decisiontask", "journal": journal}
+            taskgraph = TaskGraph(tasks, Graph(set(tasks), set()))
+            label_to_taskid = {t.label: tid for tid, t in tasks.items()}
+
+            # conflicts are errors, unless resuming
+            with self.assertRaises(RuntimeError):
+                create.create_tasks(
+                    GRAPH_CONFIG, taskgraph, label_to_taskid, {"level": "4"}, **kwargs
+                )
+            session.put.reset_mock()
+            create.create_tasks(
+                GRAPH_CONFIG, taskgraph, label_to_taskid, {"level": "4"}, **kwargs
+            )
+            self.assertEqual(
+                create.read_journal(journal, "decisiontask"),
+                {"tid-0", "tid-1", "tid-2"},
+            )
+
+    @unittest.skipIf(web is None, "aiohttp is not installed")
+    def test_create_tasks_asyncio_resume_existing(self):
+        "the asyncio backend considers tasks that already exist created when resuming"
+        create.create_task = self.old_create_task
+        tasks = {
+            f"tid-{i}": Task(kind="test", label=f"t-{i}", attributes={}, task={})
+            for i in range(3)
+        }
+        taskgraph = TaskGraph(tasks, Graph(set(tasks), set()))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal = os.path.join(tmpdir, "journal.txt")
+            with open(journal, "w") as fh:
+                fh.write("decisiontask\ntid-0\n")
+            queue = MockQueue(existing=["tid-1"])
+            with queue as url, mock.patch.object(create, "QUEUE_URL", url):
+                create.create_tasks(
+                    GRAPH_CONFIG,
+                    taskgraph,
+                    {t.label: tid for tid, t in tasks.items()},
+                    {"level": "4"},
+                    decision_task_id="decisiontask",
+                    backend="asyncio",
+                    journal=journal,
+                )
+
+            self.assertEqual(queue.created, ["tid-2"])
+            self.assertEqual(
+                create.read_journal(journal, "decisiontask"),
+                {"tid-0", "tid-1", "tid-2"},
+            )
@@ -13,6 +13,9 @@ from pathlib import Path
 import pytest
 
 from taskgraph import decision
+from taskgraph.graph import Graph
+from taskgraph.task import Task
+from taskgraph.taskgraph import TaskGraph
 from taskgraph.util.vcs import GitRepository, HgRepository
 from taskgraph.util.yaml import load_yaml
 
@@ -33,6 +36,25 @@ class TestDecision(unittest.TestCase):
                 shutil.rmtree(tmpdir)
             decision.ARTIFACTS_DIR = Path("artifacts")
 
+    def test_write_artifact_taskgraph(self):
+        taskgraph = TaskGraph(
+            {
+                "a": Task(kind="test", label="a", attributes={}, task={"t": "a"}),
+                "b": Task(kind="test", label="b", attributes={}, task={"t": "b"}),
+            },
+            Graph({"a", "b"}, {("a", "b", "dep")}),
+        )
+        tmpdir = tempfile.mkdtemp()
+        try:
+            decision.ARTIFACTS_DIR = Path(tmpdir) / "artifacts"
+            decision.write_artifact("artifact.json", taskgraph)
+            with open(os.path.join(decision.ARTIFACTS_DIR, "artifact.json")) as f:
+                self.assertEqual(json.load(f), taskgraph.to_json())
+        finally:
+            if os.path.exists(tmpdir):
+                shutil.rmtree(tmpdir)
+            decision.ARTIFACTS_DIR = Path("artifacts")
+
     def test_write_artifact_yml(self):
         data = [{"some": "data"}]
         tmpdir = tempfile.mkdtemp()
@@ -224,3 +246,174 @@ def test_determine_more_accurate_base_rev(
 )
 def test_get_env_prefix(graph_config, expected_value):
     assert decision._get_env_prefix(graph_config) == expected_value
+
+
+@pytest.mark.parametrize(
+    "filename",
+    (
+        "artifact.json",
+        "artifact.yml",
+        "artifact.gz",
+        "artifact.json.gz",
+        "artifact.json.zst",
+        "artifact.yml.zst",
+        "artifact.msgpack",
+        "artifact.msgpack.gz",
+        "artifact.msgpack.zst",
+    ),
+)
+def test_write_read_artifact(monkeypatch, tmp_path, filename):
+    if ".msgpack" in filename:
+        pytest.importorskip("msgpack")
+    monkeypatch.setattr(decision, "ARTIFACTS_DIR", tmp_path / "artifacts")
+
+    data = {"some": ["data", 1, None], "ü": {}}
+    decision.write_artifact(filename, data)
+    assert decision.read_artifact(filename) == data
+
+    taskgraph = TaskGraph(
+        {
+            "a": Task(kind="test", label="a", attributes={}, task={"t": "a"}),
+            "b": Task(kind="test", label="b", attributes={}, task={"t": "b"}),
+        },
+        Graph({"a", "b"}, {("a", "b", "dep")}),
+    )
+    decision.write_artifact(filename, taskgraph)
+    assert decision.read_artifact(filename) == taskgraph.to_json()
+
+
+def test_write_artifact_unknown_format(monkeypatch, tmp_path):
+    monkeypatch.setattr(decision, "ARTIFACTS_DIR", tmp_path / "artifacts")
+    with pytest.raises(TypeError):
+        decision.write_artifact("artifact.txt", {})
+    with pytest.raises(TypeError):
+        decision.read_artifact("artifact.txt")
+
+
+def test_taskgraph_decision_resume(mocker, monkeypatch, tmp_path):
+    monkeypatch.setattr(decision, "ARTIFACTS_DIR", tmp_path / "artifacts")
+    monkeypatch.setenv("TASK_ID", "decisiontask")
+    create_tasks = mocker.patch.object(decision, "create_tasks")
+    generator = mocker.patch.object(decision, "TaskGraphGenerator")
+
+    taskgraph = TaskGraph(
+        {
+            "tid-a": Task(
+                kind="test",
+                label="a",
+                attributes={},
+                task={"t": "a"},
+                dependencies={"dep": "tid-b"},
+            ),
+            "tid-b": Task(kind="test", label="b", attributes={}, task={"t": "b"}),
+        },
+        Graph({"tid-a", "tid-b"}, {("tid-a", "tid-b", "dep")}),
+    )
+    decision.write_artifact("task-graph.json", taskgraph)
+    decision.write_artifact("label-to-taskid.json", {"a": "tid-a", "b": "tid-b"})
+    decision.write_artifact("parameters.yml", {"level": "1"})
+    (decision.ARTIFACTS_DIR / decision.JOURNAL).write_text("decisiontask\ntid-b\n")
+
+    root = Path(__file__).parent / "data" / "taskcluster"
+    decision.taskgraph_decision({"root": str(root)})
+
+    generator.assert_not_called()
+    args, kwargs = create_tasks.call_args
+    assert args[1] == taskgraph
+    assert args[2:] == ({"a": "tid-a", "b": "tid-b"}, {"level": "1"})
+    assert kwargs["decision_task_id"] == "decisiontask"
+    assert kwargs["journal"] == decision.ARTIFACTS_DIR / decision.JOURNAL
+
+
+def test_taskgraph_decision_resume_previous_run(
+    mocker, monkeypatch, tmp_path, responses
+):
+    monkeypatch.setattr(decision, "ARTIFACTS_DIR", tmp_path / "previous")
+    monkeypatch.setenv("TASK_ID", "decisiontask")
+    monkeypatch.setenv("RUN_ID", "1")
+    create_tasks = mocker.patch.object(decision, "create_tasks")
+    generator = mocker.patch.object(decision, "TaskGraphGenerator")
+
+    # the artifacts uploaded by the previous run
+    taskgraph = TaskGraph(
+        {"tid-a": Task(kind="test", label="a", attributes={}, task={"t": "a"})},
+        Graph({"tid-a"}, set()),
+    )
+    decision.write_artifact("task-graph.json", taskgraph)
+    decision.write_artifact("label-to-taskid.json", {"a": "tid-a"})
+    decision.write_artifact("parameters.yml", {"level": "1"})
+    (decision.ARTIFACTS_DIR / decision.JOURNAL).write_text("decisiontask\n")
+    artifacts = sorted(p.name for p in decision.ARTIFACTS_DIR.iterdir())
+
+    url = f"{os.environ['TASKCLUSTER_ROOT_URL']}/api/queue/v1/task/decisiontask/runs/0/artifacts"
+    responses.add(
+        responses.GET,
+        url,
+        json={
+            "artifacts": [{"name": f"public/{name}"} for name in artifacts]
+            + [{"name": "public/logs/live.log"}, {"name": "private/secret"}]
+        },
+    )
+    for name in artifacts:
+        responses.add(
+            responses.GET,
+            f"{url}/public/{name}",
+            body=(decision.ARTIFACTS_DIR / name).read_bytes(),
+        )
+
+    monkeypatch.setattr(decision, "ARTIFACTS_DIR", tmp_path / "artifacts")
+    root = Path(__file__).parent / "data" / "taskcluster"
+    decision.taskgraph_decision({"root": str(root)})
+
+    assert sorted(p.name for p in decision.ARTIFACTS_DIR.iterdir()) == artifacts
+    generator.assert_not_called()
+    args, kwargs = create_tasks.call_args
+    assert args[1] == taskgraph
+    assert args[2:] == ({"a": "tid-a"}, {"level": "1"})
+    assert kwargs["journal"] == decision.ARTIFACTS_DIR / decision.JOURNAL
+
+
+def test_fetch_previous_run(monkeypatch, tmp_path, responses):
+    monkeypatch.setattr(decision, "ARTIFACTS_DIR", tmp_path)
+
+    # nothing to fetch for the first run
+    monkeypatch.setenv("RUN_ID", "0")
+    assert not decision.fetch_previous_run("decisiontask")
+
+    # nor if no previous run got to create tasks
+    monkeypatch.setenv("RUN_ID", "2")
+    url = f"{os.environ['TASKCLUSTER_ROOT_URL']}/api/queue/v1/task/decisiontask/runs"
+    for run_id in (1, 0):
+        responses.add(
+            responses.GET,
+            f"{url}/{run_id}/artifacts/public/{decision.JOURNAL}",
+            status=404,
+        )
+    assert not decision.fetch_previous_run("decisiontask")
+    assert list(tmp_path.iterdir()) == []
+
+    # runs without artifacts are skipped over
+    responses.replace(
+        responses.GET,
+        f"{url}/0/artifacts/public/{decision.JOURNAL}",
+        body="decisiontask\n",
+    )
+    responses.add(
+        responses.GET,
+        f"{url}/0/artifacts",
+        json={
+            "artifacts": [
+                {"name": f"public/{decision.JOURNAL}"},
+                {"name": "public/label-to-taskid.json"},
+            ]
+        },
+    )
+    responses.add(
+        responses.GET,
+        f"{url}/0/artifacts/public/label-to-taskid.json",
+        json={"a": "tid-a"},
+    )
+    assert decision.fetch_previous_run("decisiontask")
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        [decision.JOURNAL, "label-to-taskid.json"]
+    )
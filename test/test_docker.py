@@ -12,7 +12,9 @@ def mock_docker_path(module_mocker, datadir):
 
 @pytest.fixture
 def mock_docker_build(mocker):
-    def side_effect(topsrcdir, context_dir, out_file, image_name=None, args=None):
+    def side_effect(
+        topsrcdir, context_dir, out_file, image_name=None, args=None, **kwargs
+    ):
         out_file.write(b"xyz")
 
     m_stream = mocker.patch.object(docker.docker, "stream_context_tar")
@@ -2,10 +2,12 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
 from taskgraph import generator, graph
+from taskgraph.config import GraphConfig
 from taskgraph.generator import Kind, load_tasks_for_kind
 from taskgraph.loader.default import loader as default_loader
 
@@ -25,6 +27,68 @@ def test_kind_ordering(maketgg):
     assert FakeKind.loaded_kinds == ["_fake1", "_fake2", "_fake3"]
 
 
+def test_kind_load_parallel(maketgg, monkeypatch):
+    "Loading kinds on a process pool gives the same result as a serial load"
+
+    def load_graph_config(root_dir):
+        # the fake `register` lambda can't be pickled; mark the path as
+        # already registered instead
+        graph_config = fake_load_graph_config(root_dir)
+        del graph_config.__dict__["register"]
+        return graph_config
+
+    monkeypatch.setattr(GraphConfig, "_PATH_MODIFIED", "/root")
+    # the loader records the labels of the `loaded_tasks` it is passed
+    kinds = [
+        ("_fake3", {"kind-dependencies": ["_fake2"], "record-loaded-tasks": True}),
+        ("_fake2", {"kind-dependencies": ["_fake1"], "record-loaded-tasks": True}),
+        ("_fake1", {"kind-dependencies": []}),
+        ("_fake0", {"kind-dependencies": []}),
+    ]
+    serial = maketgg(kinds=kinds).full_task_set
+    tgg = maketgg(kinds=kinds, kind_workers=2)
+    monkeypatch.setattr(generator, "load_graph_config", load_graph_config)
+    parallel = tgg.full_task_set
+
+    assert list(parallel.tasks) == list(serial.tasks)
+    assert parallel.to_json() == serial.to_json()
+    assert serial["_fake3-t-0"].attributes["loaded_tasks"] == [
+        "_fake2-t-0",
+        "_fake2-t-1",
+        "_fake2-t-2",
+    ]
+    # the kinds were loaded in worker processes
+    assert FakeKind.loaded_kinds == []
+
+
+def test_kind_load_parallel_dependencies(maketgg, monkeypatch):
+    "Kinds loaded on a process pool are only passed their dependencies' tasks"
+    passed = {}
+
+    def load_tasks_in_worker(kind, parameters, loaded_tasks, write_artifacts, fast):
+        passed[kind.name] = {task.kind for task in loaded_tasks}
+        return kind.load_tasks(parameters, loaded_tasks, write_artifacts)
+
+    monkeypatch.setattr(generator, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(generator, "_load_tasks_in_worker", load_tasks_in_worker)
+    tgg = maketgg(
+        kinds=[
+            ("_fake3", {"kind-dependencies": ["_fake2"]}),
+            ("_fake2", {"kind-dependencies": ["_fake1"]}),
+            ("_fake1", {"kind-dependencies": []}),
+            ("_fake0", {"kind-dependencies": []}),
+        ],
+        kind_workers=2,
+    )
+    tgg._run_until("full_task_set")
+    assert passed == {
+        "_fake0": set(),
+        "_fake1": set(),
+        "_fake2": {"_fake1"},
+        "_fake3": {"_fake2"},
+    }
+
+
 def test_full_task_set(maketgg):
     "The full_task_set property has all tasks"
     tgg = maketgg()
@@ -3,11 +3,33 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import random
+import sys
 import unittest
+from unittest import mock
 
+from taskgraph import graph as graph_mod
 from taskgraph.graph import Graph
 
 
+def fixed_point_closure(graph, nodes, reverse=False):
+    """Reference implementation of `Graph.transitive_closure`, expanding
+    along every edge until reaching a fixed point."""
+    new_nodes, new_edges = nodes, set()
+    nodes, edges = set(), set()
+    while (new_nodes, new_edges) != (nodes, edges):
+        nodes, edges = new_nodes, new_edges
+        add_edges = {
+            (left, right, name)
+            for (left, right, name) in graph.edges
+            if (right if reverse else left) in nodes
+        }
+        add_nodes = {(left if reverse else right) for (left, right, _) in add_edges}
+        new_nodes = nodes | add_nodes
+        new_edges = edges | add_edges
+    return Graph(new_nodes, new_edges)
+
+
 class TestGraph(unittest.TestCase):
     tree = Graph(
         {"a", "b", "c", "d", "e", "f", "g"},
@@ -123,6 +145,58 @@ class TestGraph(unittest.TestCase):
         "transitive closure of a linear graph includes all nodes in the line"
         self.assertEqual(self.linear.transitive_closure({"1"}), self.linear)
 
+    def test_transitive_closure_reverse(self):
+        "reverse transitive closure of a leaf is the path back to the roots"
+        self.assertEqual(
+            self.tree.transitive_closure({"e"}, reverse=True),
+            Graph({"a", "b", "e"}, {("a", "b", "L"), ("b", "e", "K")}),
+        )
+
+    def test_transitive_closure_unknown_nodes(self):
+        "transitive closure of unknown nodes raises"
+        with self.assertRaises(Exception):
+            self.tree.transitive_closure({"z"})
+
+    def test_transitive_closure_matches_fixed_point(self):
+        "transitive closure of a large random DAG matches the fixed-point algorithm"
+        rng = random.Random(42)
+        nodes = [f"n{i}" for i in range(500)]
+        edges = {
+            (nodes[i], nodes[j], f"e{rng.randint(0, 2)}")
+            for i in range(len(nodes) - 3)
+            for j in rng.sample(range(i + 1, len(nodes)), 3)
+        }
+        graph = Graph(set(nodes), edges)
+        for reverse in (False, True):
+            start = set(rng.sample(nodes, 10))
+            self.assertEqual(
+                graph.transitive_closure(start, reverse=reverse),
+                fixed_point_closure(graph, start, reverse=reverse),
+            )
+
+    def test_transitive_closure_chain(self):
+        "transitive closure of a chain matches the fixed-point algorithm"
+        nodes = [f"n{i}" for i in range(100)]
+        edges = {(nodes[i], nodes[i + 1], "dep") for i in range(len(nodes) - 1)}
+        graph = Graph(set(nodes), edges)
+        self.assertEqual(graph.transitive_closure({nodes[0]}), graph)
+        self.assertEqual(fixed_point_closure(graph, {nodes[0]}), graph)
+        self.assertEqual(
+            graph.transitive_closure({nodes[-1]}, reverse=True),
+            fixed_point_closure(graph, {nodes[-1]}, reverse=True),
+        )
+
+    def test_transitive_closure_adjacency_cached(self):
+        "the adjacency used by transitive closures is built once per graph"
+        graph = Graph(self.diamonds.nodes, self.diamonds.edges)
+        with mock.patch.object(
+            graph_mod, "_CompactGraph", wraps=graph_mod._CompactGraph
+        ) as compact_graph:
+            for node in ("A", "D", "J"):
+                graph.transitive_closure({node})
+                graph.transitive_closure({node}, reverse=True)
+        compact_graph.assert_called_once_with(graph)
+
     def test_visit_postorder_empty(self):
         "postorder visit of an empty graph is empty"
         self.assertEqual(list(Graph(set(), set()).visit_postorder()), [])
@@ -154,6 +228,50 @@ class TestGraph(unittest.TestCase):
         "postorder visit of a disjoint graph satisfies invariant"
         self.assert_postorder(self.disjoint.visit_postorder(), self.disjoint.nodes)
 
+    def test_visit_postorder_deterministic(self):
+        "postorder visit takes ready nodes in sorted order"
+        self.assertEqual(
+            list(self.tree.visit_postorder()), ["d", "e", "b", "f", "g", "c", "a"]
+        )
+        self.assertEqual(list(self.linear.visit_postorder()), ["4", "3", "2", "1"])
+
+    def test_visit_postorder_repeated(self):
+        "repeated postorder visits of the same graph yield the same sequence"
+        self.assertEqual(
+            list(self.diamonds.visit_postorder()),
+            list(self.diamonds.visit_postorder()),
+        )
+
+    def test_visit_postorder_deep(self):
+        "postorder visit of a chain deeper than the recursion limit does not recurse"
+        nodes = [f"{i:06d}" for i in range(sys.getrecursionlimit() * 2)]
+        graph = Graph(
+            set(nodes), {(nodes[i], nodes[i + 1], "L") for i in range(len(nodes) - 1)}
+        )
+        self.assertEqual(list(graph.visit_postorder()), nodes[::-1])
+        self.assertEqual(list(graph.visit_preorder()), nodes)
+
+    def test_visit_order_cached(self):
+        "the topological orders are computed once per graph"
+        graph = Graph(self.diamonds.nodes, self.diamonds.edges)
+        with mock.patch.object(
+            Graph, "_topological_order", autospec=True, wraps=Graph._topological_order
+        ) as topological_order:
+            self.assertEqual(
+                list(graph.visit_postorder()), list(graph.visit_postorder())
+            )
+            self.assertEqual(list(graph.visit_preorder()), list(graph.visit_preorder()))
+        self.assertEqual(
+            topological_order.call_args_list,
+            [mock.call(graph, reverse=False), mock.call(graph, reverse=True)],
+        )
+
+    def test_visit_postorder_cycle(self):
+        "postorder visit of a cyclic graph raises"
+        graph = Graph({"a", "b", "c"}, {("a", "b", "L"), ("b", "a", "L")})
+        with self.assertRaises(Exception):
+            list(graph.visit_postorder())
+
     def assert_preorder(self, seq, all_nodes):
         seen = set()
         for e in seq:
@@ -211,3 +329,24 @@ class TestGraph(unittest.TestCase):
                 "3": {"4"},
             },
         )
+
+    def test_links_dicts_match_edges(self):
+        "link dicts of a large random graph agree with its edges"
+        rng = random.Random(7)
+        nodes = [f"n{i}" for i in range(300)]
+        edges = {
+            (nodes[i], nodes[j], f"e{j}")
+            for i in range(len(nodes) - 4)
+            for j in rng.sample(range(i + 1, len(nodes)), 4)
+        }
+        graph = Graph(set(nodes), edges)
+
+        links, named_links, reverse_links = {}, {}, {}
+        for left, right, name in edges:
+            links.setdefault(left, set()).add(right)
+            named_links.setdefault(left, {})[name] = right
+            reverse_links.setdefault(right, set()).add(left)
+
+        self.assertEqual(graph.links_dict(), links)
+        self.assertEqual(graph.named_links_dict(), named_links)
+        self.assertEqual(graph.reverse_links_dict(), reverse_links)
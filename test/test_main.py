@@ -1,6 +1,8 @@
 # Any copyright is dedicated to the public domain.
 # http://creativecommons.org/publicdomain/zero/1.0/
 
+import json
+import logging
 import os
 import sys
 from pathlib import Path
@@ -9,8 +11,9 @@ from textwrap import dedent
 import pytest
 
 import taskgraph
+from taskgraph.config import GraphConfig
 from taskgraph.graph import Graph
-from taskgraph.main import get_filtered_taskgraph
+from taskgraph.main import get_affected_kinds, get_filtered_taskgraph
 from taskgraph.main import main as taskgraph_main
 from taskgraph.task import Task
 from taskgraph.taskgraph import TaskGraph
@@ -101,6 +104,84 @@ def test_show_taskgraph_force_local_files_changed(mocker, run_taskgraph):
     assert repo.get_changed_files.call_count == 1
 
 
+@pytest.mark.parametrize(
+    "args,use_cache,use_hash_cache",
+    (
+        pytest.param([], False, True, id="default"),
+        pytest.param(["--kind-cache"], True, True, id="kind-cache"),
+        pytest.param(["--kind-cache", "--no-cache"], False, True, id="no-cache"),
+        pytest.param(["--no-hash-cache"], False, False, id="no-hash-cache"),
+    ),
+)
+def test_show_taskgraph_caches(maketgg, mocker, args, use_cache, use_hash_cache):
+    get_taskgraph_generator = mocker.patch.object(
+        taskgraph.main, "get_taskgraph_generator", return_value=maketgg()
+    )
+    assert taskgraph_main(["full"] + args) == 0
+    assert get_taskgraph_generator.call_args[0][2:] == (
+        use_cache,
+        None,
+        use_hash_cache,
+    )
+
+
+def test_show_taskgraph_diff_incremental(
+    caplog, capsys, datadir, mocker, monkeypatch, tmp_path, repo
+):
+    root = Path(repo.path) / "taskcluster"
+    (root / "kinds").mkdir(parents=True)
+    (root / "config.yml").write_text(
+        (datadir / "taskcluster" / "config.yml").read_text()
+    )
+
+    def write_kind(name, version):
+        kind_dir = root / "kinds" / name
+        kind_dir.mkdir(exist_ok=True)
+        label = f"{name}-{version}"
+        config = {
+            "loader": "taskgraph.loader.transform:loader",
+            "transforms": [],
+            "tasks": {
+                label: {
+                    "label": label,
+                    "description": "",
+                    "attributes": {},
+                    "task": {},
+                    "dependencies": {},
+                },
+            },
+        }
+        (kind_dir / "kind.yml").write_text(json.dumps(config))
+
+    write_kind("unchanged", 1)
+    write_kind("changed", 1)
+    repo.run("add", ".")
+    repo.run("commit", "-m", "Add kinds")
+    write_kind("changed", 2)
+    repo.run("commit", "-m", "Change a kind", ".")
+
+    monkeypatch.chdir(repo.path)
+    monkeypatch.setattr(
+        taskgraph.main.appdirs, "user_cache_dir", lambda *args: str(tmp_path / "cache")
+    )
+    # The diff reloads the taskgraph modules, and loading the graph config adds
+    # its directory to the python path.
+    mocker.patch.dict(sys.modules)
+    monkeypatch.setattr(sys, "path", sys.path[:])
+    monkeypatch.setattr(GraphConfig, "_PATH_MODIFIED", False)
+    caplog.set_level(logging.DEBUG)
+
+    base_rev = ".~1" if repo.tool == "hg" else "HEAD~1"
+    # Without parameters, the defaults (e.g `head_rev`) differ between the
+    # revisions.
+    assert taskgraph_main(["full", "-v", "--diff", base_rev, "--incremental"]) == 0
+
+    reused = [r.message for r in caplog.records if r.message.startswith("Reusing")]
+    assert reused == ["Reusing tasks for unaffected kind unchanged"]
+    out, _ = capsys.readouterr()
+    assert "-changed-1\n+changed-2\n unchanged-1" in out
+
+
 def test_tasks_regex(run_taskgraph, capsys):
     run_taskgraph(["full", "--tasks=_.*-t-1"])
     out, _ = capsys.readouterr()
@@ -230,6 +311,66 @@ def test_get_filtered_taskgraph(regex, exclude, expected):
     assert filtered.to_json() == expected
 
 
+@pytest.fixture
+def kinds_root(tmp_path):
+    root = tmp_path / "taskcluster"
+    kinds = {
+        "docker-image": {
+            "loader": "myproject.loader:loader",
+            "transforms": ["myproject.transforms.docker"],
+        },
+        "build": {
+            "kind-dependencies": ["docker-image"],
+            "transforms": ["taskgraph.transforms.run:transforms"],
+        },
+        "test": {
+            "kind-dependencies": ["build"],
+            "transforms": ["myproject.transforms.test"],
+        },
+        "lint": {"loader": "taskgraph.loader.transform:loader"},
+    }
+    for name, config in kinds.items():
+        kind_dir = root / "kinds" / name
+        kind_dir.mkdir(parents=True)
+        (kind_dir / "kind.yml").write_text(json.dumps(config))
+    (root / "myproject").mkdir()
+    (root / "myproject" / "__init__.py").write_text("")
+    return root
+
+
+@pytest.mark.parametrize(
+    "changed,expected",
+    (
+        pytest.param([], set(), id="nothing"),
+        pytest.param(["kinds/test/kind.yml"], {"test"}, id="kind-dir"),
+        pytest.param(
+            ["kinds/build/tasks.yml"], {"build", "test"}, id="kind-dependents"
+        ),
+        pytest.param(
+            ["myproject/transforms/docker.py"],
+            {"docker-image", "build", "test", "lint"},
+            id="project-package",
+        ),
+        pytest.param(
+            [os.path.join(os.path.dirname(taskgraph.__file__), "transforms/run.py")],
+            {"build", "test", "lint"},
+            id="taskgraph-package",
+        ),
+        pytest.param(
+            ["config.yml"], {"docker-image", "build", "test", "lint"}, id="config"
+        ),
+        pytest.param(
+            ["docker/foo/script.py"],
+            {"docker-image", "build", "test", "lint"},
+            id="not-a-package",
+        ),
+    ),
+)
+def test_get_affected_kinds(kinds_root, changed, expected):
+    paths = [os.path.join(kinds_root, p) for p in changed]
+    assert get_affected_kinds(str(kinds_root), paths) == expected
+
+
 def test_init_taskgraph(mocker, tmp_path, project_root, repo_with_upstream):
     name = "bar"
     repo, _ = repo_with_upstream
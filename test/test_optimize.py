@@ -9,7 +9,9 @@ import pytest
 
 from taskgraph.graph import Graph
 from taskgraph.optimize import base as optimize_mod
-from taskgraph.optimize.base import All, Any, Not, OptimizationStrategy
+from taskgraph.optimize import strategies as strategies_mod
+from taskgraph.optimize.base import Alias, All, Any, Not, OptimizationStrategy
+from taskgraph.optimize.strategies import IndexSearch
 from taskgraph.task import Task
 from taskgraph.taskgraph import TaskGraph
 
@@ -462,8 +464,154 @@ def test_get_subgraph(monkeypatch, graph, kwargs, exp_subgraph, exp_label_to_tas
     assert kwargs["label_to_taskid"] == exp_label_to_taskid
 
 
+def test_get_subgraph_copies_references():
+    "get_subgraph doesn't modify the task definitions of the target task graph"
+    env = {"DEP": {"task-reference": "<dep>"}, "FOO": "bar"}
+    artifacts = [{"name": "foo"}]
+    task_def = {
+        "payload": {"env": env, "artifacts": artifacts},
+        "dependencies": ["existing"],
+    }
+    graph = make_graph(
+        make_task("t1", task_def=task_def),
+        make_task("t2"),
+        ("t1", "t2", "dep"),
+    )
+    subgraph = optimize_mod.get_subgraph(
+        graph, set(), set(), {"t1": "tid1", "t2": "tid2"}, "DECISION-TASK"
+    )
+
+    payload = subgraph.tasks["tid1"].task["payload"]
+    assert payload["env"] == {"DEP": "tid2", "FOO": "bar"}
+    assert subgraph.tasks["tid1"].task["dependencies"] == ["existing", "tid2"]
+    assert task_def == {
+        "payload": {"env": env, "artifacts": artifacts},
+        "dependencies": ["existing"],
+    }
+    assert env == {"DEP": {"task-reference": "<dep>"}, "FOO": "bar"}
+    # containers without references are shared
+    assert payload["artifacts"] is artifacts
+
+
 def test_get_subgraph_removed_dep():
     "get_subgraph raises an Exception when a task depends on a removed task"
     graph = make_triangle()
     with pytest.raises(Exception):
         optimize_mod.get_subgraph(graph, {"t2"}, set(), {})
+
+
+def test_optimize_task_graph_batches_nested_index_search(mocker):
+    "Index lookups of IndexSearch strategies nested in composites are batched"
+    index_search = IndexSearch()
+    strategies = {
+        "nested": Any(Alias(index_search), Not("never")),
+        "index": index_search,
+    }
+    graph = make_graph(
+        make_task("t1", optimization={"nested": ["idx.t1", "idx.other"]}),
+        make_task("t2", optimization={"index": ["idx.t2"]}),
+        make_task("t3", optimization={"nested": ["idx.t3"]}),
+        ("t2", "t1", "dep"),
+    )
+
+    find_task_id_batched = mocker.patch.object(
+        optimize_mod, "find_task_id_batched", return_value={"idx.t1": "e1"}
+    )
+    status_task_batched = mocker.patch.object(
+        optimize_mod,
+        "status_task_batched",
+        return_value={
+            "e1": {"state": "completed", "expires": "2099-01-01T00:00:00.000Z"}
+        },
+    )
+    find_task_id = mocker.patch.object(
+        strategies_mod, "find_task_id", side_effect=KeyError
+    )
+
+    _, label_to_taskid = optimize_mod.optimize_task_graph(
+        graph,
+        requested_tasks=set(graph.tasks),
+        params={},
+        do_not_optimize=set(),
+        decision_task_id="DECISION-TASK",
+        strategy_override=strategies,
+    )
+
+    assert sorted(find_task_id_batched.call_args[0][0]) == [
+        "idx.other",
+        "idx.t1",
+        "idx.t2",
+        "idx.t3",
+    ]
+    status_task_batched.assert_called_once_with(["e1"])
+    # paths the batched lookups didn't find aren't looked up again
+    assert not find_task_id.called
+    assert label_to_taskid["t1"] == "e1"
+    # t3 isn't indexed, but `Not("never")` replaces it with nothing
+    assert "t3" not in label_to_taskid
+    # the batched results are dropped once the optimization is done
+    assert index_search._index_to_taskid is None
+
+
+def test_optimize_task_graph_run_hooks(mocker):
+    "Strategies see the arguments of the whole run, including nested ones"
+
+    class Recorder(OptimizationStrategy):
+        runs = []
+
+        def begin_run(self, params, args):
+            super().begin_run(params, args)
+            self.runs.append(sorted(args))
+
+        def should_remove_task(self, task, params, arg):
+            self.run_cache.setdefault(arg, []).append(task.label)
+            return False
+
+    recorder = Recorder()
+    strategies = {
+        "recorder": recorder,
+        "nested": Any(Alias(recorder), Not("never")),
+    }
+    graph = make_graph(
+        make_task("t1", optimization={"recorder": "a"}),
+        make_task("t2", optimization={"nested": "b"}),
+        make_task("t3", optimization={"recorder": "a"}),
+        make_task("t4", optimization={"recorder": "c"}),
+    )
+    end_run = mocker.spy(recorder, "end_run")
+
+    optimize_mod.optimize_task_graph(
+        graph,
+        requested_tasks=set(graph.tasks),
+        params={},
+        do_not_optimize={"t4"},
+        decision_task_id="DECISION-TASK",
+        strategy_override=strategies,
+    )
+
+    assert recorder.runs == [["a", "a", "b"]]
+    end_run.assert_called_once_with()
+    assert recorder.run_cache is None
+
+
+def test_optimize_task_graph_skip_unless_changed(mocker):
+    "The patterns of all skip-unless-changed tasks are matched at once"
+    matcher = mocker.spy(strategies_mod, "PatternMatcher")
+    graph = make_graph(
+        make_task("t1", optimization={"skip-unless-changed": ["src/**"]}),
+        make_task("t2", optimization={"skip-unless-changed": ["docs/**"]}),
+        make_task("t3", optimization={"skip-unless-changed": ["src/**"]}),
+        make_task("t4", optimization={"skip-unless-changed": ["docs/**", "src/a.py"]}),
+    )
+
+    subgraph, _ = optimize_mod.optimize_task_graph(
+        graph,
+        requested_tasks=set(graph.tasks),
+        params={"files_changed": ["src/a.py", "README"]},
+        do_not_optimize=set(),
+        decision_task_id="DECISION-TASK",
+    )
+
+    assert sorted(t.label for t in subgraph.tasks.values()) == ["t1", "t3", "t4"]
+    assert matcher.call_count == 1
+    assert set(matcher.call_args[0][0]) == {"src/**", "docs/**", "src/a.py"}
@@ -112,6 +112,36 @@ def test_index_search(caplog, responses, params, state, expires, expected, logs)
         assert caplog.record_tuples == log_records
 
 
+def test_index_search_prefetched(responses, params):
+    status = {"state": "completed", "expires": "2021-06-08T14:53:16.937Z"}
+    deadline = "2021-06-07T19:03:20.482Z"
+
+    opt = IndexSearch()
+    opt.set_index_lookups(
+        {"foo.prefetched": "abc"}, {"abc": status}, ["foo.prefetched", "foo.absent"]
+    )
+
+    # paths covered by the optimizer's batched lookups don't hit the network,
+    # whether they were found or not
+    assert opt.should_replace_task({}, params, deadline, ["foo.prefetched"]) == "abc"
+    assert opt.should_replace_task({}, params, deadline, ["foo.absent"]) is False
+
+    # other paths are still looked up individually
+    responses.add(
+        responses.GET,
+        f"{os.environ['TASKCLUSTER_ROOT_URL']}/api/index/v1/task/foo.missing",
+        json={"taskId": "def"},
+        status=200,
+    )
+    responses.add(
+        responses.GET,
+        f"{os.environ['TASKCLUSTER_ROOT_URL']}/api/queue/v1/task/def/status",
+        json={"status": status},
+        status=200,
+    )
+    assert opt.should_replace_task({}, params, deadline, ["foo.missing"]) == "def"
+
+
 @pytest.mark.parametrize(
     "params,file_patterns,should_optimize",
     (
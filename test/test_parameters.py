@@ -6,6 +6,7 @@
 import datetime
 import gzip
 import os
+import pickle
 from base64 import b64decode
 from unittest import TestCase, mock
 
@@ -79,6 +80,14 @@ class TestParameters(TestCase):
         p = Parameters(owner="nobody@example.test", level=20)
         self.assertEqual(p["owner"], "nobody@example.test")
 
+    def test_Parameters_pickle(self):
+        p = Parameters(strict=False, spec="foo.yml", xyz=10, **self.vals)
+        p2 = pickle.loads(pickle.dumps(p))
+        self.assertIsInstance(p2, Parameters)
+        self.assertEqual(p2, p)
+        self.assertFalse(p2.strict)
+        self.assertEqual(p2.spec, "foo.yml")
+
     def test_Parameters_check(self):
         p = Parameters(**self.vals)
         p.check()  # should not raise
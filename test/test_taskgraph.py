@@ -3,6 +3,8 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import io
+import json
 import unittest
 
 from taskgraph.graph import Graph
@@ -65,6 +67,46 @@ class TestTaskGraph(unittest.TestCase):
             },
         )
 
+    def test_iter_json(self):
+        res = list(self.simple_graph.iter_json())
+        self.assertEqual([key for key, _ in res], ["b", "a"])
+        self.assertEqual(dict(res), self.simple_graph.to_json())
+
+    def test_write_json(self):
+        tasks = {
+            "a": Task(
+                kind="test",
+                label="a",
+                attributes={"attr": "a-task"},
+                task={"taskdef": True, "payload": {"command": ["x\ny"], "env": {}}},
+            ),
+            "c": Task(kind="test", label="c", attributes={}, task={"ü": []}),
+            "b": Task(kind="test", label="b", attributes={}, task={"task": "def"}),
+        }
+        tasks["a"].task_id = "abc"
+        graph = Graph(
+            nodes=set("abc"), edges={("a", "b", "first"), ("c", "a", "second")}
+        )
+        for taskgraph in (TaskGraph(tasks, graph), TaskGraph({}, Graph(set(), set()))):
+            fh = io.StringIO()
+            taskgraph.write_json(fh)
+            self.assertEqual(
+                fh.getvalue(),
+                json.dumps(
+                    taskgraph.to_json(),
+                    sort_keys=True,
+                    indent=2,
+                    separators=(",", ": "),
+                ),
+            )
+
+            fh = io.StringIO()
+            taskgraph.write_json(fh, compact=True)
+            self.assertEqual(
+                fh.getvalue(),
+                json.dumps(taskgraph.to_json(), sort_keys=True, separators=(",", ":")),
+            )
+
     def test_round_trip(self):
         graph = TaskGraph(
             tasks={
@@ -91,6 +133,55 @@ class TestTaskGraph(unittest.TestCase):
         tasks, new_graph = TaskGraph.from_json(graph.to_json())
         self.assertEqual(graph, new_graph)
 
+    def test_from_json_lazy(self):
+        tasks_dict = self.simple_graph.to_json()
+        tasks, graph = TaskGraph.from_json(tasks_dict, lazy=True)
+
+        # nothing is materialized until accessed
+        self.assertEqual(tasks._tasks, {})
+        self.assertIn("a", graph)
+        self.assertNotIn("c", graph)
+        self.assertEqual(len(graph.tasks), 2)
+        self.assertEqual(tasks._tasks, {})
+
+        self.assertEqual(graph["b"], self.simple_graph["b"])
+        self.assertIs(graph["b"], tasks["b"])
+        self.assertEqual(list(tasks._tasks), ["b"])
+
+        self.assertIn(("a", "b", "prereq"), graph.graph.edges)
+        self.assertNotIn(("a", "b", "other"), graph.graph.edges)
+        self.assertEqual(
+            graph.graph.transitive_closure({"a"}),
+            Graph({"a", "b"}, {("a", "b", "prereq")}),
+        )
+        self.assertEqual(graph, self.simple_graph)
+
+    def test_from_json_lazy_set_operations(self):
+        tasks, graph = TaskGraph.from_json(self.simple_graph.to_json(), lazy=True)
+        edges = graph.graph.edges
+
+        new_edge = ("b", "a", "other")
+        self.assertEqual(
+            edges | {new_edge}, frozenset({("a", "b", "prereq"), new_edge})
+        )
+        self.assertEqual(edges - {("a", "b", "prereq")}, frozenset())
+        self.assertEqual(edges & {("a", "b", "prereq")}, {("a", "b", "prereq")})
+        self.assertEqual(edges, {("a", "b", "prereq")})
+
+    def test_from_json_lazy_modify_tasks(self):
+        tasks, graph = TaskGraph.from_json(self.simple_graph.to_json(), lazy=True)
+        new_task = Task(kind="new", label="c", attributes={}, task={})
+
+        tasks["c"] = new_task
+        self.assertEqual(sorted(tasks._tasks), ["a", "b", "c"])
+        self.assertIs(graph["c"], new_task)
+        self.assertEqual(graph["a"], self.simple_graph["a"])
+
+        del tasks["a"]
+        self.assertNotIn("a", graph)
+        self.assertEqual(sorted(tasks), ["b", "c"])
+        self.assertEqual(len(tasks), 2)
+
     simple_graph = TaskGraph(
         tasks={
             "a": Task(
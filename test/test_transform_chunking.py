@@ -33,3 +33,21 @@ def test_transforms(request, run_transform):
     assert len(tasks) == 2, "Chunking should've generated 2 tasks"
     assert_chunked_task(tasks[0], 1)
     assert_chunked_task(tasks[1], 2)
+
+
+def test_chunks_are_independent(run_transform):
+    task = deepcopy(TASK_DEFAULTS)
+    task["chunk"]["total-chunks"] = 3
+    task["chunk"]["substitution-fields"].append("worker.command")
+    task["worker"] = {"command": ["run", "--chunk={this_chunk}"], "env": {}}
+
+    tasks = run_transform(chunking.transforms, task)
+    assert [t["worker"]["command"][1] for t in tasks] == [
+        "--chunk=1",
+        "--chunk=2",
+        "--chunk=3",
+    ]
+
+    tasks[0]["worker"]["env"]["FOO"] = "bar"
+    assert tasks[1]["worker"]["env"] == {}
+    assert tasks[2]["worker"]["env"] == {}
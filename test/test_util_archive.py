@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import gzip
 import hashlib
 import io
 import os
@@ -15,6 +16,8 @@ import pytest
 
 from taskgraph.util.archive import (
     DEFAULT_MTIME,
+    PARALLEL_BLOCK_SIZE,
+    ParallelGzipFile,
     create_tar_from_files,
     create_tar_gz_from_files,
 )
@@ -172,3 +175,43 @@ class TestArchive(unittest.TestCase):
 
         finally:
             shutil.rmtree(d)
+
+    def test_create_tar_gz_parallel(self):
+        d = tempfile.mkdtemp()
+        try:
+            outputs = set()
+            for threads in (1, 4):
+                files = self._create_files(d)
+                gp = os.path.join(d, f"test-{threads}.tar.gz")
+                with open(gp, "wb") as fh:
+                    create_tar_gz_from_files(
+                        fh, files, filename="foobar", compression_threads=threads
+                    )
+                outputs.add(file_hash(gp))
+
+                with tarfile.open(gp, "r:gz") as tf:
+                    self._verify_basic_tarfile(tf)
+
+            # the output doesn't depend on the number of threads
+            self.assertEqual(len(outputs), 1)
+        finally:
+            shutil.rmtree(d)
+
+
+def test_parallel_gzip_file():
+    data = os.urandom(PARALLEL_BLOCK_SIZE) + b"taskgraph" * PARALLEL_BLOCK_SIZE
+
+    outputs = set()
+    for threads in (1, 3):
+        out = io.BytesIO()
+        with ParallelGzipFile(out, threads=threads) as gf:
+            for i in range(0, len(data), 10000):
+                gf.write(data[i : i + 10000])
+        outputs.add(out.getvalue())
+        assert gzip.decompress(out.getvalue()) == data
+    assert len(outputs) == 1
+
+    out = io.BytesIO()
+    with ParallelGzipFile(out):
+        pass
+    assert gzip.decompress(out.getvalue()) == b""
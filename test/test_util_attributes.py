@@ -7,6 +7,7 @@ import unittest
 
 from taskgraph.util.attributes import (
     attrmatch,
+    keymatch,
     match_run_on_git_branches,
     match_run_on_projects,
 )
@@ -82,3 +83,30 @@ class MatchRunOnGitBranches(unittest.TestCase):
         self.assertTrue(match_run_on_git_branches("release/v1.0", ["^release/.+$"]))
         self.assertFalse(match_run_on_git_branches("release_v2.0", ["^release/.+$"]))
         self.assertFalse(match_run_on_git_branches("release_v2.0", ["^release/.+$"]))
+
+
+class Keymatch(unittest.TestCase):
+    alternatives = {
+        "linux64": "exact",
+        "linux.*": "regex",
+        "mac(osx)?-.*": "group",
+        "default": "fallback",
+    }
+
+    def test_exact(self):
+        self.assertEqual(keymatch(self.alternatives, "linux64"), ["exact"])
+
+    def test_regex(self):
+        self.assertEqual(keymatch(self.alternatives, "linux32"), ["regex"])
+        self.assertEqual(keymatch(self.alternatives, "macosx-arm"), ["group"])
+        self.assertEqual(keymatch(self.alternatives, "mac-arm"), ["group"])
+        # patterns are anchored at both ends
+        self.assertEqual(keymatch(self.alternatives, "android-linux"), ["fallback"])
+
+    def test_literal_prefix(self):
+        # a key without special characters doesn't match as a prefix
+        self.assertEqual(keymatch({"linux": 1}, "linux64"), [])
+        self.assertEqual(keymatch({"linux": 1, "default": 2}, "linux64"), [2])
+
+    def test_multiple(self):
+        self.assertEqual(keymatch({"a.*": 1, ".*b": 2}, "ab"), [1, 2])
@@ -1,3 +1,5 @@
+import datetime
+
 import pytest
 
 from taskgraph.task import Task
@@ -13,6 +15,9 @@ from taskgraph.util.readonlydict import ReadOnlyDict
         "foo",
         ReadOnlyDict(a=1, b="foo"),
         ["foo", "bar"],
+        ("foo", ["bar"]),
+        datetime.date(2024, 1, 1),
+        {"foo", "bar"},
         {
             "foo": Task(
                 label="abc",
@@ -39,11 +39,49 @@ class TestDocker(unittest.TestCase):
                 docker.generate_context_hash(
                     tmpdir, os.path.join(tmpdir, "docker/my-image"), "my-image"
                 ),
-                "e1649b3427bd7a0387f4508d25057c2e89228748517aad6c70e3df54f47bd13a",
+                "afccf21d5efb85e609adc9689ae55b57e890cdaf9cb6ea97eca3a209c0cf726e",
             )
         finally:
             shutil.rmtree(tmpdir)
 
+    def test_generate_context_hash_includes(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            d = os.path.join(tmp, "test-image")
+            os.mkdir(d)
+            with open(os.path.join(d, "Dockerfile"), "wb") as fh:
+                fh.write(b"# %ARG PYTHON_VERSION\n")
+                fh.write(b"# %include extra\n")
+                fh.write(b"FROM python:$PYTHON_VERSION\n")
+            extra = os.path.join(tmp, "extra")
+            os.mkdir(extra)
+            p = os.path.join(extra, "script")
+            with open(p, "wb") as fh:
+                fh.write(b"script")
+            os.chmod(p, MODE_STANDARD)
+
+            def context_hash(version="3.8"):
+                return docker.generate_context_hash(
+                    tmp, d, args={"PYTHON_VERSION": version}
+                )
+
+            with mock.patch.object(docker, "create_tar_gz_from_files") as m:
+                h = context_hash()
+            self.assertFalse(m.called)
+
+            # changing the arguments, or making an included file executable
+            # changes the hash
+            self.assertNotEqual(context_hash("3.11"), h)
+            os.chmod(p, MODE_STANDARD | stat.S_IXUSR)
+            self.assertNotEqual(context_hash(), h)
+            os.chmod(p, MODE_STANDARD)
+            self.assertEqual(context_hash(), h)
+            # but other permission bits, which depend on the umask, don't
+            os.chmod(p, MODE_STANDARD | stat.S_IWGRP)
+            self.assertEqual(context_hash(), h)
+        finally:
+            shutil.rmtree(tmp)
+
     def test_docker_image_explicit_registry(self):
         files = {}
         files[f"{docker.IMAGE_DIR}/myimage/REGISTRY"] = "cool-images"
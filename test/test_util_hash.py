@@ -0,0 +1,99 @@
+# Any copyright is dedicated to the public domain.
+# http://creativecommons.org/publicdomain/zero/1.0/
+
+import hashlib
+import os
+
+import pytest
+
+from taskgraph.util import hash as hash_mod
+from taskgraph.util.hash import hash_path, hash_paths
+from taskgraph.util.lookup_cache import LookupCache
+
+
+@pytest.fixture
+def files(tmp_path):
+    for name, content in (
+        ("a.txt", "a"),
+        ("dir/b.txt", "b"),
+        ("dir/sub/c.sh", "c" * (hash_mod.CHUNK_SIZE + 1)),
+        ("other/d.txt", "d"),
+    ):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    yield tmp_path
+    hash_mod._get_all_files.cache_clear()
+    hash_mod._find_matching_files.cache_clear()
+
+
+def expected_digest(base, paths):
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        with open(os.path.join(base, path), "rb") as fh:
+            digest = hashlib.sha256(fh.read()).hexdigest()
+        h.update(f"{digest} {path}\n".encode())
+    return h.hexdigest()
+
+
+@pytest.mark.parametrize(
+    "patterns,expected",
+    (
+        pytest.param(["a.txt"], ["a.txt"], id="file"),
+        pytest.param(["dir"], ["dir/b.txt", "dir/sub/c.sh"], id="directory"),
+        pytest.param(["dir/**/*.sh"], ["dir/sub/c.sh"], id="wildcard"),
+        pytest.param(
+            ["*.txt", "other/*"], ["a.txt", "other/d.txt"], id="multiple-patterns"
+        ),
+    ),
+)
+def test_hash_paths(files, patterns, expected):
+    assert hash_paths(str(files), patterns) == expected_digest(files, expected)
+
+
+def test_hash_paths_no_match(files):
+    with pytest.raises(Exception, match="nothing.txt did not match anything"):
+        hash_paths(str(files), ["nothing.txt"])
+
+
+def test_get_all_files_prefix(files):
+    assert sorted(hash_mod._get_all_files(str(files), "dir")) == [
+        "dir/b.txt",
+        "dir/sub/c.sh",
+    ]
+    assert hash_mod._get_all_files(str(files), "a.txt") == ["a.txt"]
+    assert hash_mod._get_all_files(str(files), "missing") == []
+
+
+def test_hash_cache(files, monkeypatch, tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp("cache")
+    monkeypatch.setattr(
+        hash_mod, "hash_cache", LookupCache(str(cache_dir / "hashes.sqlite"), 60)
+    )
+    expected = expected_digest(files, ["dir/b.txt", "dir/sub/c.sh"])
+    assert hash_paths(str(files), ["dir"]) == expected
+
+    # hashes are now read from the cache
+    def fail(path):
+        raise AssertionError(f"{path} was hashed again")
+
+    monkeypatch.setattr(hash_mod, "_hash_file", fail)
+    assert hash_paths(str(files), ["dir"]) == expected
+
+    # modified files are hashed again
+    monkeypatch.undo()
+    monkeypatch.setattr(
+        hash_mod, "hash_cache", LookupCache(str(cache_dir / "hashes.sqlite"), 60)
+    )
+    (files / "dir" / "b.txt").write_text("modified")
+    assert hash_paths(str(files), ["dir"]) == expected_digest(
+        files, ["dir/b.txt", "dir/sub/c.sh"]
+    )
+    assert hash_paths(str(files), ["dir"]) != expected
+
+
+def test_hash_path(files):
+    path = str(files / "dir" / "sub" / "c.sh")
+    assert (
+        hash_path(path) == hashlib.sha256(b"c" * (hash_mod.CHUNK_SIZE + 1)).hexdigest()
+    )
@@ -0,0 +1,141 @@
+# Any copyright is dedicated to the public domain.
+# http://creativecommons.org/publicdomain/zero/1.0/
+
+import os
+import time
+
+import pytest
+
+import taskgraph
+from taskgraph.generator import Kind
+from taskgraph.util.kind_cache import KindCache
+
+from .conftest import FakeKind
+from .fixtures.gen import make_task
+
+
+@pytest.fixture
+def kind_dir(tmp_path):
+    path = tmp_path / "kinds" / "test"
+    path.mkdir(parents=True)
+    (path / "kind.yml").write_text("transforms: []\n")
+    (path / "tasks.yml").write_text("a: {}\n")
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return KindCache(str(tmp_path / "cache"))
+
+
+def make_kind(kind_dir, graph_config, **config):
+    config.setdefault("transforms", ["taskgraph.transforms.task:transforms"])
+    return Kind("test", str(kind_dir), config, graph_config)
+
+
+def test_key_stable(cache, kind_dir, graph_config, parameters):
+    kind = make_kind(kind_dir, graph_config)
+    assert cache.key(kind, parameters, []) == cache.key(kind, parameters, [])
+
+
+def test_key_inputs(cache, kind_dir, graph_config, parameters):
+    kind = make_kind(kind_dir, graph_config, **{"kind-dependencies": ["dep"]})
+    key = cache.key(kind, parameters, [])
+
+    # kind configuration
+    other = make_kind(kind_dir, graph_config, **{"kind-dependencies": ["other"]})
+    assert cache.key(other, parameters, []) != key
+
+    # parameters, except the ones defaulting to the current time
+    assert cache.key(kind, dict(parameters, level="3"), []) != key
+    assert cache.key(kind, dict(parameters, pushdate=0), []) == key
+
+    # upstream tasks, but only from kind-dependencies
+    assert cache.key(kind, parameters, [make_task("a", kind="unrelated")]) == key
+    dep_key = cache.key(kind, parameters, [make_task("a", kind="dep")])
+    assert dep_key != key
+    assert (
+        cache.key(kind, parameters, [make_task("a", kind="dep", attributes={"x": 1})])
+        != dep_key
+    )
+
+    # files in the kind directory
+    (kind_dir / "tasks.yml").write_text("b: {}\n")
+    # hash_path is memoized per path, so use a new file
+    (kind_dir / "more-tasks.yml").write_text("c: {}\n")
+    assert cache.key(kind, parameters, []) != key
+
+
+def test_get_put(cache, kind_dir, graph_config, parameters):
+    assert cache.get("missing") is None
+
+    tasks = [make_task("a"), make_task("b")]
+    cache.put("key", tasks)
+    assert cache.get("key") == tasks
+
+
+def test_evict(tmp_path):
+    cache = KindCache(str(tmp_path), max_size=5000)
+    for i in range(5):
+        cache.put(f"key{i}", [make_task("a" * 1000)])
+        entry = tmp_path / f"key{i}.pickle"
+        os.utime(entry, (i, i))
+    # the most recently used entries are kept
+    assert cache.get("key0") is None
+    assert cache.get("key4") is not None
+    assert sum(p.stat().st_size for p in tmp_path.iterdir()) <= 5000
+
+
+def test_generator_uses_cache(maketgg, tmp_path):
+    cache = KindCache(str(tmp_path))
+    first = maketgg(kind_cache=cache).full_task_set
+    assert FakeKind.loaded_kinds == ["_fake"]
+
+    second = maketgg(kind_cache=cache).full_task_set
+    assert FakeKind.loaded_kinds == []
+    assert second.to_json() == first.to_json()
+
+
+def test_generator_uses_cache_with_default_parameters(maketgg, tmp_path):
+    cache = KindCache(str(tmp_path))
+    # the default parameters vary with the time of the run
+    for build_date in (1700000000, 1700000060):
+        params = {
+            "build_date": build_date,
+            "moz_build_date": time.strftime("%Y%m%d%H%M%S", time.gmtime(build_date)),
+            "pushdate": build_date,
+        }
+        maketgg(params=params, kind_cache=cache).full_task_set
+    assert FakeKind.loaded_kinds == []
+
+
+def test_generator_reuse_kinds(maketgg, monkeypatch, tmp_path):
+    cache = KindCache(str(tmp_path))
+    kinds = [
+        ("_fake1", {"kind-dependencies": []}),
+        ("_fake2", {"kind-dependencies": ["_fake1"]}),
+    ]
+    tgg = maketgg(kinds=kinds, kind_cache=cache)
+    tgg.full_task_set
+    keys = tgg.kind_cache_keys
+    assert set(keys) == {"_fake1", "_fake2"}
+
+    # a different version of taskgraph would normally miss the cache
+    monkeypatch.setattr(taskgraph, "__version__", "0.0.0")
+    tgg = maketgg(
+        kinds=kinds,
+        kind_cache=cache,
+        reuse_kinds={"_fake1": keys["_fake1"]},
+    )
+    tgg.full_task_set
+    assert FakeKind.loaded_kinds == ["_fake2"]
+
+    # tasks generated with different parameters are never reused
+    tgg = maketgg(
+        kinds=kinds,
+        params={"level": "3"},
+        kind_cache=cache,
+        reuse_kinds={"_fake1": keys["_fake1"]},
+    )
+    tgg.full_task_set
+    assert FakeKind.loaded_kinds == ["_fake1", "_fake2"]
@@ -0,0 +1,53 @@
+# Any copyright is dedicated to the public domain.
+# http://creativecommons.org/publicdomain/zero/1.0/
+
+import time
+
+import pytest
+
+from taskgraph.util.lookup_cache import LookupCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LookupCache(str(tmp_path / "cache" / "lookups.sqlite"), ttl=60)
+
+
+def test_get_put(cache):
+    assert cache.get("index", "foo") is None
+    cache.put("index", "foo", {"taskId": "abc"})
+    assert cache.get("index", "foo") == {"taskId": "abc"}
+    # kinds are separate namespaces
+    assert cache.get("status", "foo") is None
+
+
+def test_get_many(cache):
+    keys = [f"key{i}" for i in range(1200)]
+    cache.put_many("index", [(k, k.upper(), None) for k in keys[::2]])
+    assert cache.get_many("index", keys) == {k: k.upper() for k in keys[::2]}
+
+
+def test_expiry(cache, monkeypatch):
+    now = time.time()
+    cache.put("status", "expired", "a", expires=now - 1)
+    cache.put("status", "soon", "b", expires=now + 10)
+    cache.put("status", "later", "c", expires=now + 3600)
+    cache.put("status", "ttl", "d")
+    assert cache.get_many("status", ["expired", "soon", "later", "ttl"]) == {
+        "soon": "b",
+        "later": "c",
+        "ttl": "d",
+    }
+
+    # the ttl caps explicit expiry times
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    assert cache.get_many("status", ["soon", "later", "ttl"]) == {
+        "later": "c",
+        "ttl": "d",
+    }
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert cache.get_many("status", ["soon", "later", "ttl"]) == {}
+
+    # expired entries are purged when the database is next opened
+    reopened = LookupCache(cache.path, ttl=60)
+    assert reopened._db.execute("SELECT COUNT(*) FROM lookups").fetchone() == (0,)
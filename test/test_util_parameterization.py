@@ -9,7 +9,12 @@ import pytest
 # prevent pytest thinking this is a test
 from taskcluster_urls import test_root_url as _test_root_url
 
-from taskgraph.util.parameterization import resolve_task_references, resolve_timestamps
+from taskgraph.util.parameterization import (
+    find_task_references,
+    find_timestamps,
+    resolve_task_references,
+    resolve_timestamps,
+)
 from taskgraph.util.taskcluster import get_root_url
 
 
@@ -39,20 +44,57 @@ def test_timestamps_appears_with_other_keys():
     ]
 
 
+def test_timestamps_paths():
+    now = datetime.datetime(2018, 1, 1)
+    input = {
+        "deadline": {"relative-datestamp": "1 day"},
+        "payload": {
+            "artifacts": [
+                {"name": "a", "expires": {"relative-datestamp": "1 day"}},
+                {"name": "b", "expires": {"relative-datestamp": "2 days"}},
+            ],
+            "env": {"FOO": "bar"},
+        },
+    }
+    paths = find_timestamps(input)
+    assert paths == [
+        ("deadline",),
+        ("payload", "artifacts", 0, "expires"),
+        ("payload", "artifacts", 1, "expires"),
+    ]
+
+    output = resolve_timestamps(now, input, paths)
+    assert output == resolve_timestamps(now, input)
+    assert output["payload"]["artifacts"][1]["expires"] == "2018-01-03T00:00:00.000Z"
+    # the input is left alone, and untouched parts are shared
+    assert input["deadline"] == {"relative-datestamp": "1 day"}
+    assert input["payload"]["artifacts"][0]["expires"] == {
+        "relative-datestamp": "1 day"
+    }
+    assert output["payload"]["env"] is input["payload"]["env"]
+
+    assert find_timestamps({"relative-datestamp": "1 day"}) == [()]
+    assert resolve_timestamps(now, {"relative-datestamp": "1 day"}, [()]) == (
+        "2018-01-02T00:00:00.000Z"
+    )
+
+
 @pytest.fixture
 def assert_task_refs():
     def inner(input, output):
         taskid_for_edge_name = {"edge%d" % n: "tid%d" % n for n in range(1, 4)}
-        assert (
-            resolve_task_references(
-                "subject",
-                input,
-                "tid-self",
-                "tid-decision",
-                taskid_for_edge_name,
+        for paths in (None, find_task_references(input)):
+            assert (
+                resolve_task_references(
+                    "subject",
+                    input,
+                    "tid-self",
+                    "tid-decision",
+                    taskid_for_edge_name,
+                    paths=paths,
+                )
+                == output
             )
-            == output
-        )
 
     return inner
 
@@ -152,12 +194,18 @@ def assert_artifact_refs(monkeypatch):
         # Clear memoized function
         get_root_url.cache_clear()
         taskid_for_edge_name = {"edge%d" % n: "tid%d" % n for n in range(1, 4)}
-        assert (
-            resolve_task_references(
-                "subject", input, "tid-self", "tid-decision", taskid_for_edge_name
+        for paths in (None, find_task_references(input)):
+            assert (
+                resolve_task_references(
+                    "subject",
+                    input,
+                    "tid-self",
+                    "tid-decision",
+                    taskid_for_edge_name,
+                    paths=paths,
+                )
+                == output
             )
-            == output
-        )
 
     return inner
 
@@ -258,3 +306,19 @@ def test_artifact_refs_badly_formed():
             "subject", {"artifact-reference": inv}, "tid-self", "tid-decision", {}
         )
         assert resolved == inv
+
+
+def test_find_task_references():
+    task_def = {
+        "payload": {
+            "env": {"DEP": {"task-reference": "<edge1>"}, "FOO": "bar"},
+            "mounts": [{"content": {"artifact-reference": "<edge2/public/a>"}}],
+        },
+        "routes": ["index.foo"],
+        "multikey": {"task-reference": "<edge1>", "other": 1},
+    }
+    assert find_task_references(task_def) == [
+        ("payload", "env", "DEP"),
+        ("payload", "mounts", 0, "content"),
+    ]
+    assert find_task_references({"payload": {"env": {}}}) == []
@@ -9,6 +9,7 @@ import os
 import unittest
 
 from taskgraph.util.path import (
+    PatternMatcher,
     basedir,
     basename,
     commonprefix,
@@ -125,6 +126,36 @@ class TestPath(unittest.TestCase):
         self.assertFalse(match("foo/nobar/baz.qux", "foo/**/bar/**"))
         self.assertTrue(match("foo/bar", "foo/**/bar/**"))
 
+    def test_pattern_matcher(self):
+        patterns = [
+            "",
+            "foo",
+            "foo/bar",
+            "*",
+            "foo/*/baz.qux",
+            "*/*/*",
+            "foo/b*r/ba*z.qux",
+            "foo/b*z/ba*r.qux",
+            "**",
+            "**/baz.qux",
+            "foo/**/bar/*.qux",
+            "**.qux",
+            "foo/*/bar",
+            "foo/**/bar/**",
+            "**/**/baz.qux",
+            "bar//baz",
+        ]
+        matcher = PatternMatcher(patterns)
+        paths = ["foo", "foo/bar", "foo/bar/baz.qux", "foo/nobar/baz.qux", "qux"]
+        for path in paths:
+            self.assertEqual(
+                matcher.matches(path), {p for p in patterns if match(path, p)}
+            )
+        self.assertEqual(
+            PatternMatcher(["qux", "foo/**/bar", "nope"]).match_any(paths),
+            {"qux", "foo/**/bar"},
+        )
+
     def test_rebase(self):
         self.assertEqual(rebase("foo", "foo/bar", "bar/baz"), "baz")
         self.assertEqual(rebase("foo", "foo", "bar/baz"), "bar/baz")
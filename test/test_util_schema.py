@@ -233,3 +233,11 @@ def test_optionally_keyed_by():
 
     with pytest.raises(MultipleInvalid):
         validator({"by-bar": {"a": "b"}})
+
+
+def test_optionally_keyed_by_compiles_once(mocker):
+    validator = optionally_keyed_by("foo", str)
+    compile = mocker.spy(Schema, "_compile")
+    validator("baz")
+    validator({"by-foo": {"a": "b", "c": "d"}})
+    assert compile.call_count == 1
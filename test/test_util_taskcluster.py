@@ -3,6 +3,7 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import datetime
+import json
 import os
 
 import pytest
@@ -13,6 +14,7 @@ from responses import matchers
 
 from taskgraph.task import Task
 from taskgraph.util import taskcluster as tc
+from taskgraph.util.lookup_cache import LookupCache
 
 
 @pytest.fixture(autouse=True)
@@ -130,6 +132,13 @@ def test_get_artifact_url(monkeypatch, use_proxy, expected):
     assert tc.get_artifact_url(task_id, path, use_proxy) == expected
 
 
+def test_get_artifact_url_run_id(root_url):
+    assert (
+        tc.get_artifact_url("abc", "public/log.txt", run_id=1)
+        == f"{root_url}/api/queue/v1/task/abc/runs/1/artifacts/public/log.txt"
+    )
+
+
 def test_get_artifact(responses, root_url):
     tid = 123
     responses.add(
@@ -291,6 +300,147 @@ def test_status_task(responses, root_url):
     assert tc.status_task(tid) == {"state": "running"}
 
 
+def test_status_task_batched(responses, root_url):
+    url = f"{root_url}/api/queue/v1/tasks/status"
+
+    def callback(request):
+        body = json.loads(request.body)
+        token = request.params.get("continuationToken")
+        # return the statuses one page at a time
+        task_ids = body["taskIds"][1:] if token else body["taskIds"][:1]
+        data = {
+            "statuses": [
+                {"taskId": tid, "status": {"state": "completed"}} for tid in task_ids
+            ]
+        }
+        if not token:
+            data["continuationToken"] = "next"
+        return (200, {}, json.dumps(data))
+
+    responses.add_callback(responses.POST, url, callback=callback)
+    assert tc.status_task_batched(["a", "b", "c"]) == {
+        tid: {"state": "completed"} for tid in "abc"
+    }
+    assert len(responses.calls) == 2
+
+
+def test_find_task_id_batched_chunks(monkeypatch, responses, root_url):
+    monkeypatch.setattr(tc, "BATCH_SIZE", 2)
+    monkeypatch.setattr(tc.time, "sleep", lambda seconds: None)
+    url = f"{root_url}/api/index/v1/tasks/indexes"
+    throttled = []
+
+    def callback(request):
+        indexes = json.loads(request.body)["indexes"]
+        if "idx.c" in indexes and not throttled:
+            throttled.append(indexes)
+            return (429, {}, "{}")
+        tasks = [{"namespace": i, "taskId": i.upper()} for i in indexes if i != "idx.e"]
+        return (200, {}, json.dumps({"tasks": tasks}))
+
+    responses.add_callback(responses.POST, url, callback=callback)
+    index_paths = ["idx.a", "idx.b", "idx.c", "idx.d", "idx.e"]
+    assert tc.find_task_id_batched(index_paths) == {
+        "idx.a": "IDX.A",
+        "idx.b": "IDX.B",
+        "idx.c": "IDX.C",
+        "idx.d": "IDX.D",
+    }
+    # three chunks, one of which was retried after being throttled
+    assert sorted(
+        len(json.loads(c.request.body)["indexes"]) for c in responses.calls
+    ) == [
+        1,
+        2,
+        2,
+        2,
+    ]
+
+
+def test_fetch_batched_error(monkeypatch):
+    monkeypatch.setattr(tc, "BATCH_SIZE", 1)
+
+    def fetch(chunk):
+        raise ValueError(chunk)
+
+    # more chunks fail than requests are initially allowed in flight, which
+    # would block the remaining chunks if failures didn't free their slot
+    with pytest.raises(ValueError):
+        tc._fetch_batched(fetch, list(range(tc.CONCURRENCY * 2)), "things")
+
+
+@pytest.fixture
+def lookup_cache(monkeypatch, tmp_path):
+    cache = LookupCache(str(tmp_path / "lookups.sqlite"), ttl=3600)
+    monkeypatch.setattr(tc, "lookup_cache", cache)
+    return cache
+
+
+def test_lookup_cache_index(responses, root_url, lookup_cache):
+    responses.add(
+        responses.GET, f"{root_url}/api/index/v1/task/foo", json={"taskId": "abc"}
+    )
+    responses.add(responses.GET, f"{root_url}/api/index/v1/task/bar", status=404)
+    responses.add(
+        responses.POST,
+        f"{root_url}/api/index/v1/tasks/indexes",
+        json={"tasks": [{"namespace": "baz", "taskId": "def"}]},
+    )
+
+    for _ in range(2):
+        assert tc.find_task_id("foo") == "abc"
+        with pytest.raises(KeyError):
+            tc.find_task_id("bar")
+    assert tc.find_task_id_batched(["foo", "bar", "baz"]) == {
+        "foo": "abc",
+        "baz": "def",
+    }
+    assert tc.find_task_id_batched(["foo", "baz"]) == {"foo": "abc", "baz": "def"}
+
+    # missing index paths are looked up again, found ones are not
+    assert [c.request.url.rsplit("/", 1)[-1] for c in responses.calls] == [
+        "foo",
+        "bar",
+        "bar",
+        "indexes",
+    ]
+    assert json.loads(responses.calls[-1].request.body) == {"indexes": ["bar", "baz"]}
+
+
+def test_lookup_cache_status(responses, root_url, lookup_cache):
+    expires = (datetime.datetime.utcnow() + datetime.timedelta(days=1)).isoformat()
+    statuses = {
+        "a": {"state": "completed", "expires": f"{expires}Z"},
+        "b": {"state": "running", "expires": f"{expires}Z"},
+        "c": {"state": "failed", "expires": "2000-01-01T00:00:00.000Z"},
+    }
+    responses.add_callback(
+        responses.POST,
+        f"{root_url}/api/queue/v1/tasks/status",
+        callback=lambda request: (
+            200,
+            {},
+            json.dumps(
+                {
+                    "statuses": [
+                        {"taskId": tid, "status": statuses[tid]}
+                        for tid in json.loads(request.body)["taskIds"]
+                    ]
+                }
+            ),
+        ),
+    )
+
+    assert tc.status_task_batched(["a", "b", "c"]) == statuses
+    assert tc.status_task_batched(["a", "b", "c"]) == statuses
+    # only the resolved, unexpired status was cached
+    assert json.loads(responses.calls[-1].request.body) == {"taskIds": ["b", "c"]}
+
+    # entries are specific to a deployment
+    assert lookup_cache.get("status", f"{root_url} a") == statuses["a"]
+    assert lookup_cache.get("status", "https://other a") is None
+
+
 def test_state_task(responses, root_url):
     tid = "123"
     responses.add(